@@ -0,0 +1,371 @@
+"""Record-and-replay layer for QiskitRuntimeService traffic.
+
+With RUNTIME_CASSETTE_MODE=record every call made through a service returned by
+service_for() (job listings, per-job status/usage/metrics, backend status,
+properties, configuration, ...) is captured with its latency into a gzipped
+JSON-lines cassette at RUNTIME_CASSETTE_PATH. With RUNTIME_CASSETTE_MODE=replay the
+same calls are answered from the cassette, in recorded order, without any
+credentials or network, sleeping for the recorded latency multiplied by
+RUNTIME_CASSETTE_LATENCY_SCALE (0 replays instantly).
+
+Cassettes hold data only: values are decoded into plain Python values, the
+allowlisted runtime model types below, or attribute namespaces.
+"""
+import atexit
+import enum
+import gzip
+import json
+import os
+import threading
+import time
+import types
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from qiskit.providers import BackendV2
+from qiskit_ibm_runtime.base_runtime_job import BaseRuntimeJob
+from qiskit_ibm_runtime.models import BackendProperties, BackendStatus, QasmBackendConfiguration
+
+CASSETTE_MODE = os.environ.get("RUNTIME_CASSETTE_MODE", "off")
+CASSETTE_PATH = os.environ.get("RUNTIME_CASSETTE_PATH", "runtime_cassette.json.gz")
+CASSETTE_LATENCY_SCALE = float(os.environ.get("RUNTIME_CASSETTE_LATENCY_SCALE", 1.0))
+# Append a recording's new interactions to disk after this many (and at exit)
+CASSETTE_SAVE_EVERY = 200
+
+# Types rebuilt with from_dict on replay; anything else is replayed as plain attributes
+DECODABLE_TYPES = {f"{cls.__module__}:{cls.__qualname__}": cls
+                   for cls in (BackendProperties, BackendStatus, QasmBackendConfiguration)}
+
+# Private runtime job state read by extract_job_data for listed jobs
+RUNTIME_JOB_ATTRS = ("_status", "_backend", "_reason", "_error_msg_from_job_response")
+
+
+class CassetteMissError(Exception):
+    """Replay asked for an interaction the cassette does not contain"""
+
+
+class RecordedError(Exception):
+    """An exception raised by the live service, replayed with its original message"""
+
+
+class Cassette:
+    """Recorded interactions, stored as gzipped JSON lines: a header line, then one
+    [key, entry] line per interaction, appended in gzip members as they are recorded."""
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # key -> recorded responses in call order
+        self.interactions: Dict[str, List[Dict]] = {}
+        self._cursors: Dict[str, int] = {}
+        # [key, entry] pairs recorded since the last flush
+        self._pending: List[list] = []
+        if mode == "replay" or (mode == "record" and os.path.exists(path)):
+            if not self.load() and mode == "record":
+                # Version 1 cassettes are a single JSON document, which cannot be appended to
+                self.save()
+
+    def load(self) -> bool:
+        """Read the cassette; False for a version 1 (single document) file"""
+        with gzip.open(self.path, "rt") as f:
+            header = json.loads(f.readline())
+            if "interactions" in header:
+                self.interactions = header["interactions"]
+                return False
+            for line in f:
+                key, entry = json.loads(line)
+                self.interactions.setdefault(key, []).append(entry)
+        return True
+
+    def save(self) -> None:
+        """Rewrite the whole cassette"""
+        with self._write_lock:
+            with self._lock:
+                lines = [[key, entry] for key, entries in self.interactions.items() for entry in entries]
+                self._pending = []
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, "wt") as f:
+                self._write(f, lines, header=True)
+            os.replace(tmp_path, self.path)
+
+    def flush(self) -> None:
+        """Append the interactions recorded since the last flush"""
+        with self._write_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return
+            header = not os.path.exists(self.path)
+            with gzip.open(self.path, "at") as f:
+                self._write(f, lines, header)
+
+    @staticmethod
+    def _write(f, lines: List[list], header: bool) -> None:
+        if header:
+            f.write(json.dumps({"version": 2, "created": datetime.now().isoformat()}) + "\n")
+        for line in lines:
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+    def record(self, key: str, entry: Dict) -> None:
+        with self._lock:
+            self.interactions.setdefault(key, []).append(entry)
+            self._pending.append([key, entry])
+            flush = len(self._pending) >= CASSETTE_SAVE_EVERY
+        if flush:
+            self.flush()
+
+    def next(self, key: str) -> Dict:
+        """Next recorded response for key; the last one repeats once the sequence is exhausted"""
+        with self._lock:
+            entries = self.interactions.get(key)
+            if not entries:
+                raise CassetteMissError(f"No recorded interaction for {key}")
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+            entry = entries[min(index, len(entries) - 1)]
+        if self.latency_scale > 0 and entry.get("latency"):
+            time.sleep(entry["latency"] * self.latency_scale)
+        return entry
+
+    def has(self, key: str) -> bool:
+        return bool(self.interactions.get(key))
+
+# ---------------------------
+# Value encoding
+# ---------------------------
+
+def _is_job(value) -> bool:
+    return callable(getattr(value, "job_id", None)) and callable(getattr(value, "status", None))
+
+
+def is_runtime_job(value) -> bool:
+    """A runtime service job, or a cassette proxy standing in for one"""
+    if isinstance(value, BaseRuntimeJob):
+        return True
+    if isinstance(value, (RecordingProxy, ReplayProxy)):
+        return object.__getattribute__(value, "_runtime_job")
+    return False
+
+
+def _is_backend(value) -> bool:
+    if isinstance(value, BackendV2):
+        return True
+    return isinstance(getattr(value, "name", None), str) and callable(getattr(value, "status", None)) \
+        and callable(getattr(value, "properties", None))
+
+
+def _public_attrs(value) -> Dict:
+    attrs = {}
+    for name in dir(value):
+        if name.startswith("_"):
+            continue
+        try:
+            attr = getattr(value, name)
+        except Exception:
+            continue
+        if not callable(attr):
+            attrs[name] = attr
+    return attrs
+
+
+def encode(value, cassette: Cassette) -> Any:
+    """JSON-compatible form of a runtime return value"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, enum.Enum):
+        return {"__enum__": {"cls": type(value).__name__, "name": value.name, "value": encode(value.value, cassette)}}
+    if isinstance(value, (list, tuple)):
+        return [encode(v, cassette) for v in value]
+    if isinstance(value, dict):
+        return {"__dict__": [[encode(k, cassette), encode(v, cassette)] for k, v in value.items()]}
+    if _is_job(value):
+        return {"__job__": value.job_id(), "runtime": is_runtime_job(value)}
+    if _is_backend(value):
+        return {"__backend__": value.name}
+    cls_name = f"{type(value).__module__}:{type(value).__qualname__}"
+    if cls_name in DECODABLE_TYPES:
+        return {"__obj__": {"cls": cls_name, "data": encode(value.to_dict(), cassette)}}
+    # Anything else keeps its plain attributes so replay can still read them
+    return {"__attrs__": [[k, encode(v, cassette)] for k, v in _public_attrs(value).items()]}
+
+
+def decode(value, cassette: Cassette) -> Any:
+    if isinstance(value, list):
+        return [decode(v, cassette) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__enum__" in value:
+        member = value["__enum__"]
+        return RecordedEnum(member.get("cls", "Enum"), member["name"], decode(member["value"], cassette))
+    if "__dict__" in value:
+        return {decode(k, cassette): decode(v, cassette) for k, v in value["__dict__"]}
+    if "__job__" in value:
+        return ReplayProxy(cassette, f"job:{value['__job__']}", value.get("runtime", False))
+    if "__backend__" in value:
+        return ReplayProxy(cassette, f"backend:{value['__backend__']}")
+    if "__obj__" in value:
+        cls = DECODABLE_TYPES.get(value["__obj__"]["cls"])
+        if cls is None:
+            raise CassetteMissError(f"Cassette holds an unsupported type {value['__obj__']['cls']}")
+        return cls.from_dict(decode(value["__obj__"]["data"], cassette))
+    if "__pickle__" in value:
+        raise CassetteMissError("Cassette holds a pickled value, which is not replayed; record it again")
+    if "__attrs__" in value:
+        return types.SimpleNamespace(**{k: decode(v, cassette) for k, v in value["__attrs__"]})
+    return value
+
+
+class RecordedEnum:
+    """Replayed enum member (e.g. JobStatus) exposing the same name/value attributes"""
+
+    def __init__(self, cls_name: str, name: str, value):
+        self.cls_name = cls_name
+        self.name = name
+        self.value = value
+
+    def __eq__(self, other):
+        return getattr(other, "name", other) == self.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __str__(self):
+        return f"{self.cls_name}.{self.name}"
+
+
+def _args_key(args, kwargs) -> str:
+    # Datetime arguments are usually "now minus N days", so they are left out of the key
+    def normalize(v):
+        if isinstance(v, datetime):
+            return "<datetime>"
+        if isinstance(v, (list, tuple)):
+            return [normalize(x) for x in v]
+        if isinstance(v, (bool, int, float, str)) or v is None:
+            return v
+        return type(v).__name__
+    return json.dumps([normalize(list(args)), {k: normalize(v) for k, v in sorted(kwargs.items())}])
+
+# ---------------------------
+# Proxies
+# ---------------------------
+
+class RecordingProxy:
+    """Forwards to a live object and records every call and attribute read"""
+
+    def __init__(self, target, cassette: Cassette, scope: str):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_cassette", cassette)
+        object.__setattr__(self, "_scope", scope)
+        object.__setattr__(self, "_runtime_job", isinstance(target, BaseRuntimeJob))
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") and not (self._runtime_job and name in RUNTIME_JOB_ATTRS):
+            # Other private state is not part of the recorded surface, so it is hidden in both modes
+            raise AttributeError(name)
+        target, cassette, scope = self._target, self._cassette, self._scope
+        start = time.perf_counter()
+        try:
+            attr = getattr(target, name)
+        except Exception as e:
+            cassette.record(f"{scope}|{name}|attr", {"error": str(e), "error_type": type(e).__name__,
+                                                     "latency": time.perf_counter() - start})
+            raise
+        if not callable(attr):
+            cassette.record(f"{scope}|{name}|attr", {"value": encode(attr, cassette),
+                                                     "latency": time.perf_counter() - start})
+            return self._wrap(attr)
+
+        def recorded_call(*args, **kwargs):
+            key = f"{scope}|{name}|{_args_key(args, kwargs)}"
+            start = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                cassette.record(key, {"error": str(e), "error_type": type(e).__name__,
+                                      "latency": time.perf_counter() - start})
+                raise
+            if isinstance(result, types.GeneratorType):
+                result = list(result)
+            cassette.record(key, {"value": encode(result, cassette), "latency": time.perf_counter() - start})
+            return self._wrap(result)
+
+        return recorded_call
+
+    def _wrap(self, value):
+        if isinstance(value, list):
+            return [self._wrap(v) for v in value]
+        if _is_job(value):
+            return RecordingProxy(value, self._cassette, f"job:{value.job_id()}")
+        if _is_backend(value):
+            return RecordingProxy(value, self._cassette, f"backend:{value.name}")
+        return value
+
+
+class ReplayProxy:
+    """Answers attribute reads and calls from the cassette"""
+
+    def __init__(self, cassette: Cassette, scope: str, runtime_job: bool = False):
+        object.__setattr__(self, "_cassette", cassette)
+        object.__setattr__(self, "_scope", scope)
+        object.__setattr__(self, "_runtime_job", runtime_job)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") and not (self._runtime_job and name in RUNTIME_JOB_ATTRS):
+            raise AttributeError(name)
+        cassette, scope = self._cassette, self._scope
+        attr_key = f"{scope}|{name}|attr"
+        if cassette.has(attr_key):
+            return self._resolve(cassette.next(attr_key))
+
+        def replayed_call(*args, **kwargs):
+            return self._resolve(cassette.next(f"{scope}|{name}|{_args_key(args, kwargs)}"))
+
+        return replayed_call
+
+    def _resolve(self, entry: Dict):
+        if "error" in entry:
+            raise RecordedError(entry["error"])
+        return decode(entry["value"], self._cassette)
+
+# ---------------------------
+# Entry point
+# ---------------------------
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Process-wide cassette for the configured mode, or None when recording/replay is off"""
+    global _cassette
+    if CASSETTE_MODE not in ("record", "replay"):
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE)
+            if CASSETTE_MODE == "record":
+                atexit.register(_cassette.flush)
+        return _cassette
+
+
+def service_for(user: Dict, factory: Callable[[], Any]):
+    """Service for a user: live, live-and-recorded, or replayed depending on RUNTIME_CASSETTE_MODE"""
+    cassette = get_cassette()
+    if cassette is None:
+        return factory()
+    scope = f"service:{user['name']}"
+    if cassette.mode == "replay":
+        if cassette.has(f"{scope}|__init__|"):
+            cassette.next(f"{scope}|__init__|")
+        return ReplayProxy(cassette, scope)
+    start = time.perf_counter()
+    service = factory()
+    cassette.record(f"{scope}|__init__|", {"value": None, "latency": time.perf_counter() - start})
+    return RecordingProxy(service, cassette, scope)
@@ -0,0 +1,531 @@
+"""Load-test harness for the Quantum Job Tracker backends.
+
+Runs one of the apps (main, main1 or main2) in-process against a local stand-in
+for IBM Quantum with configurable latency, error rate and job volume, drives
+mixed HTTP and websocket traffic straight through the ASGI interface, and
+reports throughput, per-route latency percentiles, event-loop lag and
+notification delivery delay.
+
+    python loadtest.py --app main2 --users 200 --ws 50 --duration 30 --latency-ms 80
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ---------------------------
+# Local stand-in for IBM Quantum
+# ---------------------------
+
+FAKE_BACKENDS = ["ibm_brisbane", "ibm_kyiv", "ibm_sherbrooke", "ibm_torino"]
+FAKE_ERRORS = [
+    "Job {job_id} failed: qubit {qubit} calibration out of range",
+    "Error code 1517; transpiled circuit exceeds max depth {depth}",
+    "Job {job_id} timed out after {seconds} seconds"
+]
+
+
+class FakeRuntimeError(Exception):
+    pass
+
+
+class FakeRuntimeConfig:
+    def __init__(self, latency_ms: float, error_rate: float, jobs_per_user: int, seed: int):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.jobs_per_user = jobs_per_user
+        self.random = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def call(self):
+        """Simulate one blocking upstream round trip, failing at the configured rate"""
+        with self._lock:
+            self.calls += 1
+            fail = self.random.random() < self.error_rate
+            jitter = self.random.uniform(0.5, 1.5)
+        time.sleep(self.latency * jitter)
+        if fail:
+            raise FakeRuntimeError("Simulated upstream failure")
+
+
+class FakeStatus:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeBackendRef:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeUsage:
+    def __init__(self, quantum_seconds: float, seconds: float):
+        self.quantum_seconds = quantum_seconds
+        self.seconds = seconds
+
+
+class FakeRuntimeJob:
+    """Job whose status advances QUEUED -> RUNNING -> DONE/ERROR on the wall clock"""
+
+    def __init__(self, config: FakeRuntimeConfig, user_name: str, index: int, created: datetime):
+        rnd = config.random
+        self.config = config
+        self._job_id = f"fake{user_name.lower()}{index:08d}{rnd.randrange(16 ** 8):08x}"
+        self.creation_date = created
+        self.program_id = rnd.choice(["sampler", "estimator"])
+        self.tags = [f"experiment-{rnd.randrange(50)}"]
+        self._backend = rnd.choice(FAKE_BACKENDS)
+        self._started_at = time.time() + rnd.uniform(0, 60)
+        self._finished_at = self._started_at + rnd.uniform(5, 120)
+        self._fails = rnd.random() < 0.15
+        self._quantum_seconds = round(rnd.uniform(1, 30), 2)
+        self._error = rnd.choice(FAKE_ERRORS).format(
+            job_id=self._job_id, qubit=rnd.randrange(127), depth=rnd.randrange(100, 5000), seconds=rnd.randrange(60, 3600)
+        )
+
+    def _status_name(self) -> str:
+        now = time.time()
+        if now < self._started_at:
+            return "QUEUED"
+        if now < self._finished_at:
+            return "RUNNING"
+        return "ERROR" if self._fails else "DONE"
+
+    def job_id(self) -> str:
+        return self._job_id
+
+    def status(self):
+        self.config.call()
+        return FakeStatus(self._status_name())
+
+    def backend(self):
+        self.config.call()
+        return FakeBackendRef(self._backend)
+
+    def usage(self):
+        self.config.call()
+        if self._status_name() not in ("DONE", "ERROR"):
+            return None
+        return FakeUsage(self._quantum_seconds, self._quantum_seconds * 2.5)
+
+    def metrics(self):
+        self.config.call()
+        return {
+            "timestamps": {
+                "created": self.creation_date.isoformat(),
+                "running": datetime.fromtimestamp(self._started_at, timezone.utc).isoformat()
+            },
+            "usage": {"quantum_seconds": self._quantum_seconds, "seconds": self._quantum_seconds * 2.5}
+        }
+
+    def queue_info(self):
+        return None
+
+    def error_message(self) -> Optional[str]:
+        return self._error if self._status_name() == "ERROR" else None
+
+
+class FakeBackend:
+    def __init__(self, config: FakeRuntimeConfig, name: str, runtime: "FakeRuntime" = None, user_name: str = None):
+        self.config = config
+        self.name = name
+        self.runtime = runtime
+        self.user_name = user_name
+        self._target = None
+
+    @property
+    def target(self):
+        if self._target is None:
+            from qiskit.providers.fake_provider import GenericBackendV2
+            self._target = GenericBackendV2(num_qubits=27, seed=0).target
+        return self._target
+
+    def status(self):
+        self.config.call()
+        pending = self.config.random.randrange(0, 20)
+        return type("FakeBackendStatus", (), {"operational": True, "pending_jobs": pending, "status_msg": "active"})()
+
+    def properties(self):
+        self.config.call()
+        return None
+
+    def configuration(self):
+        self.config.call()
+        return type("FakeBackendConfiguration", (), {"max_shots": 100000, "coupling_map": []})()
+
+
+class FakeExecutionMode:
+    """Stand-in for Batch/Session: a context manager that just remembers its backend"""
+
+    def __init__(self, backend: FakeBackend, **kwargs):
+        backend.config.call()
+        self.backend = backend
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSampler:
+    """Stand-in for SamplerV2: every run() adds a new job to the submitting account"""
+
+    def __init__(self, mode: FakeExecutionMode, options=None):
+        self.mode = mode
+
+    def run(self, pubs, shots=None):
+        backend = self.mode.backend
+        backend.config.call()
+        jobs = backend.runtime.jobs_for(backend.user_name)
+        job = FakeRuntimeJob(backend.config, backend.user_name, len(jobs), datetime.now(timezone.utc))
+        job._backend = backend.name
+        jobs.insert(0, job)
+        return job
+
+
+class FakeRuntime:
+    """Shared job state per account so every service instance sees the same jobs"""
+
+    def __init__(self, config: FakeRuntimeConfig):
+        self.config = config
+        self.jobs: Dict[str, List[FakeRuntimeJob]] = {}
+        self._lock = threading.Lock()
+
+    def jobs_for(self, user_name: str) -> List[FakeRuntimeJob]:
+        with self._lock:
+            if user_name not in self.jobs:
+                now = datetime.now(timezone.utc)
+                self.jobs[user_name] = [
+                    FakeRuntimeJob(self.config, user_name, i, now - timedelta(minutes=10 * i))
+                    for i in range(self.config.jobs_per_user)
+                ]
+            return self.jobs[user_name]
+
+    def service_class(self, users: List[Dict]):
+        """Drop-in replacement for QiskitRuntimeService bound to this runtime"""
+        runtime = self
+        names_by_token = {u.get("api_key"): u["name"] for u in users}
+
+        class FakeRuntimeService:
+            def __init__(self, channel=None, token=None, instance=None, **kwargs):
+                runtime.config.call()
+                self.user_name = names_by_token.get(token, "anonymous")
+
+            def jobs(self, limit=10, created_after=None, created_before=None, **kwargs):
+                runtime.config.call()
+                jobs = runtime.jobs_for(self.user_name)
+                if created_after is not None:
+                    if created_after.tzinfo is None:
+                        created_after = created_after.astimezone(timezone.utc)
+                    jobs = [j for j in jobs if j.creation_date >= created_after]
+                if created_before is not None:
+                    if created_before.tzinfo is None:
+                        created_before = created_before.astimezone(timezone.utc)
+                    jobs = [j for j in jobs if j.creation_date < created_before]
+                return jobs[:limit]
+
+            def job(self, job_id):
+                runtime.config.call()
+                return next(j for j in runtime.jobs_for(self.user_name) if j.job_id() == job_id)
+
+            def backends(self, *args, **kwargs):
+                runtime.config.call()
+                return [FakeBackend(runtime.config, name) for name in FAKE_BACKENDS]
+
+            def backend(self, name, **kwargs):
+                runtime.config.call()
+                return FakeBackend(runtime.config, name, runtime, self.user_name)
+
+        return FakeRuntimeService
+
+# ---------------------------
+# Minimal in-process ASGI drivers
+# ---------------------------
+
+async def asgi_get(app, path: str, query: str = "") -> int:
+    """Issue one GET request against the ASGI app and return the status code"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"loadtest")], "client": ("127.0.0.1", 0),
+        "server": ("loadtest", 80)
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    status = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnected.set()
+    return status
+
+
+class ASGIWebSocket:
+    def __init__(self, app, path: str, query: str = ""):
+        self.scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": path,
+            "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+            "headers": [(b"host", b"loadtest")], "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80), "subprotocols": []
+        }
+        self.app = app
+        self.to_app: asyncio.Queue = asyncio.Queue()
+        self.from_app: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        self.task = asyncio.create_task(self.app(self.scope, self.to_app.get, self.from_app.put))
+        await self.to_app.put({"type": "websocket.connect"})
+        message = await self.from_app.get()
+        if message["type"] != "websocket.accept":
+            raise RuntimeError(f"Websocket rejected: {message}")
+
+    async def receive_json(self) -> Dict:
+        while True:
+            message = await self.from_app.get()
+            if message["type"] == "websocket.close":
+                raise ConnectionError("Websocket closed by server")
+            if message["type"] == "websocket.send":
+                return json.loads(message.get("text") or message.get("bytes"))
+
+    async def close(self):
+        await self.to_app.put({"type": "websocket.disconnect", "code": 1000})
+        if self.task:
+            try:
+                await asyncio.wait_for(self.task, timeout=5)
+            except (asyncio.TimeoutError, Exception):
+                self.task.cancel()
+
+
+async def run_lifespan(app, phase: str, state: Dict):
+    """Drive the ASGI lifespan protocol so on_event startup/shutdown handlers run"""
+    if phase == "startup":
+        state["to_app"] = asyncio.Queue()
+        state["from_app"] = asyncio.Queue()
+        state["task"] = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}},
+                                                state["to_app"].get, state["from_app"].put))
+        await state["to_app"].put({"type": "lifespan.startup"})
+        await state["from_app"].get()
+    else:
+        await state["to_app"].put({"type": "lifespan.shutdown"})
+        try:
+            await asyncio.wait_for(state["from_app"].get(), timeout=5)
+        except asyncio.TimeoutError:
+            state["task"].cancel()
+
+# ---------------------------
+# Traffic
+# ---------------------------
+
+# (path template, weight); routes the selected app does not serve are skipped
+ROUTE_MIX = [
+    ("/jobs/{user}", 40),
+    ("/jobs/{user}/changes", 10),
+    ("/health", 10),
+    ("/users", 5),
+    ("/heatmap/backends", 5),
+    ("/analytics/job-status/{user}", 8),
+    ("/analytics/errors/{user}", 5),
+    ("/analytics/failures/{user}", 5),
+    ("/analytics/backend-usage/{user}", 5),
+    ("/analytics/trends/{user}", 3),
+    ("/analytics/all-users", 2),
+    ("/jobs/search", 5),
+]
+
+
+def available_routes(app) -> List[tuple]:
+    paths = {getattr(route, "path", "").replace("{user_name}", "{user}") for route in app.routes}
+    return [(template, weight) for template, weight in ROUTE_MIX if template in paths]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.loop_lag: List[float] = []
+        self.notification_delay: List[float] = []
+        self.notifications = 0
+
+
+async def dashboard_user(app, routes: List[tuple], users: List[Dict], stats: Stats, deadline: float,
+                         think: float, rnd: random.Random):
+    templates = [t for t, _ in routes]
+    weights = [w for _, w in routes]
+    while time.monotonic() < deadline:
+        template = rnd.choices(templates, weights)[0]
+        path = template.replace("{user}", rnd.choice(users)["name"])
+        query = "limit=20" if template.startswith("/jobs") else ""
+        start = time.perf_counter()
+        try:
+            status = await asgi_get(app, path, query)
+        except Exception:
+            status = 599
+        stats.latencies[template].append(time.perf_counter() - start)
+        stats.statuses[template][status] += 1
+        await asyncio.sleep(rnd.expovariate(1 / think) if think > 0 else 0)
+
+
+async def ws_subscriber(app, stats: Stats, deadline: float):
+    ws = ASGIWebSocket(app, "/ws/notifications")
+    try:
+        await ws.connect()
+    except Exception:
+        return
+    try:
+        while time.monotonic() < deadline:
+            try:
+                event = await asyncio.wait_for(ws.receive_json(), timeout=max(deadline - time.monotonic(), 0.01))
+            except (asyncio.TimeoutError, ConnectionError):
+                break
+            stats.notifications += 1
+            if event.get("timestamp"):
+                # Server timestamps are naive local time (datetime.now())
+                sent = datetime.fromisoformat(event["timestamp"])
+                stats.notification_delay.append((datetime.now() - sent).total_seconds())
+    finally:
+        await ws.close()
+
+
+async def loop_lag_probe(stats: Stats, deadline: float, interval: float = 0.05):
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stats.loop_lag.append(time.perf_counter() - start - interval)
+
+# ---------------------------
+# Reporting
+# ---------------------------
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {"count": 0}
+    data = np.asarray(values) * 1000
+    p50, p90, p99 = np.percentile(data, [50, 90, 99])
+    return {"count": len(values), "p50_ms": round(float(p50), 2), "p90_ms": round(float(p90), 2),
+            "p99_ms": round(float(p99), 2), "max_ms": round(float(data.max()), 2)}
+
+
+def build_report(args, stats: Stats, elapsed: float, upstream_calls: int) -> Dict:
+    total_requests = sum(len(v) for v in stats.latencies.values())
+    return {
+        "app": args.app,
+        "config": {
+            "users": args.users, "websockets": args.ws, "duration_s": args.duration,
+            "latency_ms": args.latency_ms, "error_rate": args.error_rate, "jobs_per_user": args.jobs_per_user
+        },
+        "elapsed_s": round(elapsed, 2),
+        "total_requests": total_requests,
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0,
+        "upstream_calls": upstream_calls,
+        "routes": {
+            template: dict(percentiles(latencies), statuses=dict(stats.statuses[template]))
+            for template, latencies in sorted(stats.latencies.items())
+        },
+        "event_loop_lag": percentiles(stats.loop_lag),
+        "notifications": {"received": stats.notifications, "delivery_delay": percentiles(stats.notification_delay)}
+    }
+
+
+def print_report(report: Dict):
+    print(f"\n{report['app']}: {report['total_requests']} requests in {report['elapsed_s']}s "
+          f"({report['throughput_rps']} req/s), {report['upstream_calls']} upstream calls")
+    print(f"{'route':40} {'count':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  statuses")
+    for template, row in report["routes"].items():
+        print(f"{template:40} {row['count']:>7} {row['p50_ms']:>9} {row['p90_ms']:>9} {row['p99_ms']:>9} "
+              f"{row['max_ms']:>9}  {row['statuses']}")
+    for label, row in (("event loop lag", report["event_loop_lag"]),
+                       ("notification delay", report["notifications"]["delivery_delay"])):
+        if row["count"]:
+            print(f"{label:40} {row['count']:>7} {row['p50_ms']:>9} {row['p90_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+    print(f"notifications received: {report['notifications']['received']}")
+
+# ---------------------------
+# Entry point
+# ---------------------------
+
+async def run(args) -> Dict:
+    module = importlib.import_module(args.app)
+    config = FakeRuntimeConfig(args.latency_ms, args.error_rate, args.jobs_per_user, args.seed)
+    runtime = FakeRuntime(config)
+    # Every app builds its services through QiskitRuntimeService, so this is the single patch point
+    module.QiskitRuntimeService = runtime.service_class(module.USERS)
+    if hasattr(module, "EXECUTION_MODES"):
+        module.EXECUTION_MODES = {name: FakeExecutionMode for name in module.EXECUTION_MODES}
+        module.SAMPLER_CLASS = FakeSampler
+    if hasattr(module, "NOTIFY_POLL_INTERVAL"):
+        module.NOTIFY_POLL_INTERVAL = args.notify_interval
+
+    app = module.app
+    routes = available_routes(app)
+    has_ws = any(getattr(r, "path", "") == "/ws/notifications" for r in app.routes)
+    stats = Stats()
+    lifespan: Dict = {}
+    await run_lifespan(app, "startup", lifespan)
+
+    rnd = random.Random(args.seed)
+    start = time.monotonic()
+    deadline = start + args.duration
+    tasks = [asyncio.create_task(loop_lag_probe(stats, deadline))]
+    if has_ws:
+        tasks += [asyncio.create_task(ws_subscriber(app, stats, deadline)) for _ in range(args.ws)]
+    tasks += [
+        asyncio.create_task(dashboard_user(app, routes, module.USERS, stats, deadline, args.think_ms / 1000,
+                                           random.Random(rnd.random())))
+        for _ in range(args.users)
+    ]
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - start
+
+    await run_lifespan(app, "shutdown", lifespan)
+    return build_report(args, stats, elapsed, config.calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a Quantum Job Tracker app against a fake IBM Quantum runtime")
+    parser.add_argument("--app", default="main2", choices=["main", "main1", "main2"], help="App module to load")
+    parser.add_argument("--users", type=int, default=200, help="Concurrent dashboard users")
+    parser.add_argument("--ws", type=int, default=50, help="Websocket notification subscribers")
+    parser.add_argument("--duration", type=float, default=30, help="Test duration in seconds")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Mean latency of each fake upstream call")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Fraction of fake upstream calls that fail")
+    parser.add_argument("--jobs-per-user", type=int, default=100, help="Jobs in each fake account")
+    parser.add_argument("--think-ms", type=float, default=500, help="Mean pause between a user's requests")
+    parser.add_argument("--notify-interval", type=float, default=2, help="NOTIFY_POLL_INTERVAL override in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
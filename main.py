@@ -1,9 +1,39 @@
-from fastapi import FastAPI, HTTPException, Query
-from qiskit_ibm_runtime import QiskitRuntimeService
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from qiskit_ibm_runtime import QiskitRuntimeService, Batch, Session, SamplerV2
+from qiskit_ibm_runtime.constants import API_TO_JOB_ERROR_MESSAGE
+from qiskit import QuantumCircuit, qpy, qasm2, transpile
+from qiskit.primitives import StatevectorSampler, StatevectorEstimator
+from qiskit.quantum_info import SparsePauliOp
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, Callable, Iterator, Tuple, Union
 import json
-from collections import defaultdict, Counter
+import os
+import re
+import hashlib
+import threading
+import bisect
+import io
+import base64
+import uuid
+import time
+import math
+import sys
+import asyncio
+import functools
+import contextvars
+import contextlib
+import copy
+import heapq
+import tracemalloc
+import numpy as np
+import pydantic_core
+import rustworkx as rx
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict, Counter, OrderedDict, deque
+import cassette
 
 app = FastAPI(title="Quantum Job Tracker Backend", version="2.0")
 
@@ -49,17 +79,60 @@ USERS = [
     },
 ]
 
+# Local directory for indexes and caches that should survive a restart
+DATA_DIR = os.environ.get("TRACKER_DATA_DIR", ".tracker_data")
+
+# Upper bound for the on-disk job result cache before least-recently-used entries are evicted
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Per-request profiling is only available when an admin token is configured
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN")
+PROFILE_MAX_STORED = 20
+
+# Worker processes for CPU-heavy circuit work (defaults to one per core)
+CIRCUIT_POOL_WORKERS = int(os.environ.get("CIRCUIT_POOL_WORKERS", os.cpu_count() or 1))
+
+# Circuits at or below these sizes may run on the local statevector primitives
+LOCAL_MAX_QUBITS = int(os.environ.get("LOCAL_MAX_QUBITS", 12))
+LOCAL_MAX_DEPTH = int(os.environ.get("LOCAL_MAX_DEPTH", 500))
+
+# How long backend objects (with their configuration/properties/target) and statuses are reused
+BACKEND_CACHE_TTL = 300
+BACKEND_STATUS_TTL = 30
+
+# How often the background collector checks backends for a new calibration (0 disables it)
+CALIBRATION_COLLECT_INTERVAL = int(os.environ.get("CALIBRATION_COLLECT_INTERVAL", 900))
+
+# Raw job records are kept this many days; older jobs live on as daily rollups (0 keeps everything raw)
+JOB_RAW_RETENTION_DAYS = int(os.environ.get("JOB_RAW_RETENTION_DAYS", 30))
+# How often jobs that left the raw window are compacted, and how far back the first run backfills
+JOB_COMPACT_INTERVAL = int(os.environ.get("JOB_COMPACT_INTERVAL", 3600))
+JOB_ROLLUP_BACKFILL_DAYS = int(os.environ.get("JOB_ROLLUP_BACKFILL_DAYS", 365))
+
+# Response lists/dicts longer than this are streamed, encoded this many entries at a time
+RESPONSE_CHUNK_ITEMS = int(os.environ.get("RESPONSE_CHUNK_ITEMS", 500))
+# Check every response against its route's response model (slow; meant for development)
+VALIDATE_RESPONSES = os.environ.get("VALIDATE_RESPONSES", "0") == "1"
+
+FAILED_STATUSES = ["ERROR", "CANCELLED", "FAILED"]
+# Failed states that carry an error message (a cancelled job has none)
+ERROR_STATUSES = {"ERROR", "FAILED"}
+# Jobs in these states never change again, so they are not re-extracted once indexed
+TERMINAL_STATUSES = {"DONE", "ERROR", "CANCELLED", "FAILED"}
+
 # ---------------------------
 # Helper Functions
 # ---------------------------
 
 def get_service(user: Dict) -> QiskitRuntimeService:
     """Initialize Qiskit Runtime Service for a user"""
-    return QiskitRuntimeService(
+    return cassette.service_for(user, lambda: runtime_call(
+        "service",
+        QiskitRuntimeService,
         channel="ibm_cloud",
         token=user["api_key"],
         instance=user["instance"]
-    )
+    ))
 
 def safe_get_attr(obj, attr, default="Unknown"):
     """Safely get attribute from object"""
@@ -71,101 +144,3429 @@ def safe_get_attr(obj, attr, default="Unknown"):
     except Exception:
         return default
 
-def extract_job_data(job) -> Dict:
-    """Extract comprehensive job data"""
-    try:
-        # Basic job info
-        job_id = safe_get_attr(job, "job_id")
-        
-        # Status
-        try:
-            status = job.status()
-            status_name = getattr(status, 'name', getattr(status, 'value', str(status)))
-        except:
-            status_name = "Unknown"
-        
-        # Backend
-        try:
-            backend = job.backend()
-            backend_name = getattr(backend, 'name', str(backend))
-        except:
-            backend_name = "Unknown"
-        
-        # Creation date
-        creation_date = safe_get_attr(job, "creation_date")
-        if creation_date and hasattr(creation_date, 'isoformat'):
-            creation_date = creation_date.isoformat()
-        
-        # Program ID
-        program_id = safe_get_attr(job, "program_id")
-        
-        # Tags
-        try:
-            tags = job.tags or []
-        except:
-            tags = []
-        
-        # Usage and metrics
-        try:
-            usage = job.usage()
-            usage_data = {
-                "quantum_seconds": getattr(usage, 'quantum_seconds', 0),
-                "seconds": getattr(usage, 'seconds', 0)
-            } if usage else {}
-        except:
-            usage_data = {}
-        
-        try:
-            metrics = job.metrics()
-            metrics_data = dict(metrics) if metrics else {}
-        except:
-            metrics_data = {}
-        
-        # Queue info
-        try:
-            queue_info = job.queue_info()
-            queue_data = {
-                "position": getattr(queue_info, 'position', None),
-                "estimated_start_time": str(getattr(queue_info, 'estimated_start_time', None))
-            } if queue_info else {}
-        except:
-            queue_data = {}
-        
-        # Error message (if any)
-        error_message = safe_get_attr(job, "error_message", None)
-        
-        return {
-            "job_id": job_id,
-            "status": status_name,
-            "backend": backend_name,
-            "creation_date": creation_date,
-            "program_id": program_id,
-            "tags": tags,
-            "usage": usage_data,
-            "metrics": metrics_data,
-            "queue_info": queue_data,
-            "error_message": error_message
-        }
-        
-    except Exception as e:
-        return {
-            "job_id": "Error",
-            "status": "Error",
-            "backend": "Error",
-            "error": str(e)
-        }
+# Runtime calls made while serving the current request, by kind (None outside a request)
+_runtime_calls: contextvars.ContextVar = contextvars.ContextVar("runtime_calls", default=None)
+
+def runtime_call(kind: str, fn, *args, **kwargs):
+    """Call into the runtime service, counting and tracing the call against the current request"""
+    calls = _runtime_calls.get()
+    if calls is not None:
+        calls[kind] += 1
+    with trace_span(kind):
+        return fn(*args, **kwargs)
+
+def list_jobs(service, **kwargs) -> List:
+    """The service's job listing, with each job's status and failure reason taken from the listing payload.
+
+    qiskit-ibm-runtime builds listed jobs without their `state`, so every later
+    status call refetches the job document. Capturing the listing pages lets
+    extract_job_data answer status and errors without one more call per job.
+    This leans on runtime internals (0.41: `_active_api_client.jobs_get`,
+    `job._set_status`); when they are missing the plain listing is returned.
+    """
+    client = getattr(service, "_active_api_client", None)
+    if client is None or not callable(getattr(client, "jobs_get", None)):
+        return list(runtime_call("jobs", service.jobs, **kwargs))
+
+    pages = []
+    fetch_page = client.jobs_get
+
+    def capture_page(*args, **page_kwargs):
+        # Counted once per listing, as in the plain path; each page still gets its own span
+        with trace_span("jobs_page"):
+            response = fetch_page(*args, **page_kwargs)
+        pages.append(response)
+        return response
+
+    client.jobs_get = capture_page
+    try:
+        jobs = list(runtime_call("jobs", service.jobs, **kwargs))
+    finally:
+        del client.jobs_get
+
+    listed = {raw.get("id"): raw for page in pages if isinstance(page, dict)
+              for raw in page.get("jobs", []) if isinstance(raw, dict)}
+    for job in jobs:
+        raw = listed.get(job.job_id())
+        if raw and isinstance(raw.get("state"), dict) and callable(getattr(job, "_set_status", None)):
+            try:
+                job._set_status(raw)
+            except Exception:
+                pass
+    return jobs
+
+def extract_job_data(job) -> Dict:
+    """Extract comprehensive job data.
+
+    Runtime jobs from list_jobs() already carry status, backend, creation date,
+    program and tags, and usage is read from the same metrics payload, so a
+    listed job costs a single metrics call; other calls are only made for
+    fields that are still missing. The listed-job state is private to
+    qiskit-ibm-runtime (0.41); if an attribute is missing the public call is
+    used instead.
+    """
+    try:
+        # Basic job info
+        job_id = safe_get_attr(job, "job_id")
+        listed = cassette.is_runtime_job(job)
+        
+        # Status
+        try:
+            status = getattr(job, "_status", None) if listed else None
+            if status is None:
+                status = runtime_call("status", job.status)
+            status_name = getattr(status, 'name', getattr(status, 'value', str(status)))
+        except Exception:
+            status_name = "Unknown"
+        
+        # Backend (job.backend() on a listed job without one blocks until the job finishes)
+        try:
+            if listed and hasattr(job, "_backend"):
+                backend = job._backend
+            else:
+                backend = runtime_call("backend", job.backend)
+            backend_name = getattr(backend, 'name', str(backend)) if backend else "Unknown"
+        except Exception:
+            backend_name = "Unknown"
+        
+        # Creation date
+        creation_date = safe_get_attr(job, "creation_date")
+        if creation_date and hasattr(creation_date, 'isoformat'):
+            creation_date = creation_date.isoformat()
+        
+        # Program ID
+        program_id = safe_get_attr(job, "program_id")
+        
+        # Tags
+        try:
+            tags = job.tags or []
+        except Exception:
+            tags = []
+        
+        # Metrics, which also carry usage
+        try:
+            metrics = runtime_call("metrics", job.metrics)
+            metrics_data = dict(metrics) if metrics else {}
+        except Exception:
+            metrics_data = {}
+        
+        payload_usage = metrics_data.get("usage")
+        if isinstance(payload_usage, dict) and payload_usage:
+            # Fields the payload leaves out stay None rather than reading as 0 s
+            usage_data = {
+                "quantum_seconds": payload_usage.get("quantum_seconds"),
+                "seconds": payload_usage.get("seconds")
+            }
+        elif listed:
+            # job.usage() would fetch the same metadata document again
+            usage_data = {}
+        else:
+            try:
+                usage = runtime_call("usage", job.usage)
+                if isinstance(usage, (int, float)):
+                    usage_data = {"quantum_seconds": usage, "seconds": None}
+                else:
+                    usage_data = {
+                        "quantum_seconds": getattr(usage, 'quantum_seconds', None),
+                        "seconds": getattr(usage, 'seconds', None)
+                    } if usage else {}
+            except Exception:
+                usage_data = {}
+        
+        # Queue info (only meaningful while queued)
+        queue_data = {}
+        if status_name == "QUEUED" and callable(getattr(job, "queue_info", None)):
+            try:
+                queue_info = runtime_call("queue_info", job.queue_info)
+                queue_data = {
+                    "position": getattr(queue_info, 'position', None),
+                    "estimated_start_time": str(getattr(queue_info, 'estimated_start_time', None))
+                } if queue_info else {}
+            except Exception:
+                queue_data = {}
+        
+        # Error message (only failed jobs have one)
+        error_message = None
+        if status_name in ERROR_STATUSES:
+            reason = getattr(job, "_reason", None) if listed else None
+            error_msg_from_response = getattr(job, "_error_msg_from_job_response", None) if listed else None
+            if reason:
+                # Same text job.error_message() builds, without fetching the job results
+                error_message = API_TO_JOB_ERROR_MESSAGE["FAILED"].format(job_id, reason)
+            elif callable(error_msg_from_response):
+                try:
+                    error_message = runtime_call("error_message", error_msg_from_response,
+                                                 {"state": {"status": status_name}})
+                except Exception:
+                    error_message = None
+            else:
+                error_message = runtime_call("error_message", safe_get_attr, job, "error_message", None)
+        
+        return {
+            "job_id": job_id,
+            "status": status_name,
+            "backend": backend_name,
+            "creation_date": creation_date,
+            "program_id": program_id,
+            "tags": tags,
+            "usage": usage_data,
+            "metrics": metrics_data,
+            "queue_info": queue_data,
+            "error_message": error_message
+        }
+        
+    except Exception as e:
+        return {
+            "job_id": "Error",
+            "status": "Error",
+            "backend": "Error",
+            "error": str(e)
+        }
+
+def save_json_atomic(path: str, data) -> None:
+    """Write JSON to disk via a temp file so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def load_json(path: str, default):
+    """Load JSON from disk, falling back to default if missing or corrupt"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+# ---------------------------
+# Failure Fingerprint Index
+# ---------------------------
+
+# Masks applied in order: the broad token shapes first, plain numbers last.
+# Numbers right after "code"/"error"/"status" are error codes and stay in the template.
+_ERROR_MASKS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<TS>"),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<UUID>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "<HEX>"),
+    (re.compile(r"\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\b"), "<HEX>"),
+    (re.compile(r"\b(?=[A-Za-z0-9]*\d)(?=[A-Za-z0-9]*[A-Za-z])[A-Za-z0-9]{16,}\b"), "<ID>"),
+    (re.compile(r"(\b(?:code|error|status)\s*[:=#]?\s*)?\d+(?:\.\d+)?", re.IGNORECASE),
+     lambda m: m.group(0) if m.group(1) else "<N>"),
+]
+
+FAILURE_INDEX_PATH = os.path.join(DATA_DIR, "failure_index.json")
+FAILURE_EXAMPLE_JOBS = 5
+# Indexed job ids kept for de-duplication; the oldest are pruned past this
+FAILURE_INDEX_MAX_JOBS = int(os.getenv("FAILURE_INDEX_MAX_JOBS", "50000"))
+# New failures are written out at most this often (and on shutdown)
+FAILURE_INDEX_FLUSH_SECONDS = float(os.getenv("FAILURE_INDEX_FLUSH_SECONDS", "5"))
+
+_failure_index_lock = threading.Lock()
+# fingerprints: fingerprint -> {template, example_message, count, backends, example_job_ids,
+#                               users: {user: {count, example_message, backends, example_job_ids}}}
+# jobs: job_id -> fingerprint, so a job seen again on a later scan is not counted twice
+def _load_failure_index() -> Dict[str, Dict]:
+    index = load_json(FAILURE_INDEX_PATH, {"fingerprints": {}, "jobs": {}})
+    for entry in index["fingerprints"].values():
+        # Older indexes kept only a per-user count
+        for user_name, stats in entry["users"].items():
+            if isinstance(stats, int):
+                entry["users"][user_name] = {"count": stats, "example_message": None, "backends": {}, "example_job_ids": []}
+    return index
+
+_failure_index: Dict[str, Dict] = _load_failure_index()
+_failure_index_dirty = False
+_failure_index_saved_at = 0.0
+
+def normalize_error_message(message: str) -> str:
+    """Turn an error message into a template by masking timestamps, IDs, hex and numbers"""
+    template = str(message)
+    for pattern, mask in _ERROR_MASKS:
+        template = pattern.sub(mask, template)
+    return " ".join(template.split())
+
+def error_fingerprint(template: str) -> str:
+    """Short stable fingerprint for an error template"""
+    return hashlib.sha1(template.encode("utf-8")).hexdigest()[:12]
+
+def _count_failure(stats: Dict, job_id: str, message: str, backend: str) -> None:
+    stats["count"] += 1
+    stats["backends"][backend] = stats["backends"].get(backend, 0) + 1
+    stats["example_job_ids"] = ([job_id] + stats["example_job_ids"])[:FAILURE_EXAMPLE_JOBS]
+    if not stats.get("example_message"):
+        stats["example_message"] = message
+
+def record_failure(user_name: str, job_data: Dict) -> None:
+    """Add a failed job to the fingerprint index (no-op for jobs already indexed)"""
+    job_id = job_data.get("job_id")
+    message = job_data.get("error_message")
+    if not message or job_data.get("status") not in FAILED_STATUSES:
+        return
+
+    template = normalize_error_message(message)
+    fingerprint = error_fingerprint(template)
+
+    global _failure_index_dirty
+    with _failure_index_lock:
+        if job_id in _failure_index["jobs"]:
+            return
+        _failure_index["jobs"][job_id] = fingerprint
+        while len(_failure_index["jobs"]) > FAILURE_INDEX_MAX_JOBS:
+            del _failure_index["jobs"][next(iter(_failure_index["jobs"]))]
+
+        entry = _failure_index["fingerprints"].setdefault(fingerprint, {
+            "template": template,
+            "example_message": None,
+            "count": 0,
+            "users": {},
+            "backends": {},
+            "example_job_ids": []
+        })
+        backend = job_data.get("backend", "Unknown")
+        _count_failure(entry, job_id, str(message), backend)
+        stats = entry["users"].setdefault(
+            user_name, {"count": 0, "example_message": None, "backends": {}, "example_job_ids": []})
+        _count_failure(stats, job_id, str(message), backend)
+        _failure_index_dirty = True
+
+    if time.monotonic() - _failure_index_saved_at >= FAILURE_INDEX_FLUSH_SECONDS:
+        flush_failure_index()
+
+def flush_failure_index() -> None:
+    """Write the fingerprint index if it changed since the last write"""
+    global _failure_index_dirty, _failure_index_saved_at
+    with _failure_index_lock:
+        if not _failure_index_dirty:
+            return
+        save_json_atomic(FAILURE_INDEX_PATH, _failure_index)
+        _failure_index_dirty = False
+        _failure_index_saved_at = time.monotonic()
+
+def failure_groups(user_name: Optional[str] = None, top: Optional[int] = None) -> List[Dict]:
+    """Failure groups from the fingerprint index, most frequent first.
+
+    With a user, the count, backends and examples are that user's own.
+    """
+    with _failure_index_lock:
+        groups = []
+        for fingerprint, entry in _failure_index["fingerprints"].items():
+            stats = entry["users"].get(user_name) if user_name else entry
+            if not stats or stats["count"] == 0:
+                continue
+            groups.append({
+                "fingerprint": fingerprint,
+                "template": entry["template"],
+                "count": stats["count"],
+                "backends": dict(stats["backends"]),
+                "example_message": stats["example_message"],
+                "example_job_ids": list(stats["example_job_ids"])
+            })
+
+    groups.sort(key=lambda g: g["count"], reverse=True)
+    return groups[:top] if top else groups
+
+# ---------------------------
+# Job Search Index
+# ---------------------------
+
+def parse_job_datetime(value) -> Optional[datetime]:
+    """Parse a job creation date (ISO string or datetime) as an aware UTC datetime"""
+    if not value or value == "Unknown":
+        return None
+    try:
+        if not isinstance(value, datetime):
+            value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+    except ValueError:
+        return None
+
+class JobIndex:
+    """In-memory secondary indexes over every job the server has ingested"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs: Dict[str, Dict] = {}
+        self.by_user: Dict[str, set] = defaultdict(set)
+        self.by_tag: Dict[str, set] = defaultdict(set)
+        self.by_program: Dict[str, set] = defaultdict(set)
+        self.by_backend: Dict[str, set] = defaultdict(set)
+        self.by_status: Dict[str, set] = defaultdict(set)
+        # (creation timestamp, job_id) pairs kept sorted for range bisection
+        self.by_created: List[tuple] = []
+
+    def _keys(self, user_name: str, job_data: Dict) -> List[tuple]:
+        keys = [
+            (self.by_user, user_name),
+            (self.by_program, job_data.get("program_id")),
+            (self.by_backend, job_data.get("backend")),
+            (self.by_status, job_data.get("status")),
+        ]
+        keys.extend((self.by_tag, tag) for tag in job_data.get("tags") or [])
+        return keys
+
+    def _unlink(self, job_id: str, record: Dict) -> None:
+        for index, key in self._keys(record["user"], record["job"]):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.discard(job_id)
+                if not bucket:
+                    del index[key]
+        if record["created_ts"] is not None:
+            pos = bisect.bisect_left(self.by_created, (record["created_ts"], job_id))
+            if pos < len(self.by_created) and self.by_created[pos] == (record["created_ts"], job_id):
+                del self.by_created[pos]
+
+    def upsert(self, user_name: str, job_data: Dict) -> None:
+        """Add a job or refresh the index entries of one already seen"""
+        job_id = job_data.get("job_id")
+        created = parse_job_datetime(job_data.get("creation_date"))
+        record = {
+            "user": user_name,
+            "job": job_data,
+            "created_ts": created.timestamp() if created else None
+        }
+
+        with self._lock:
+            old = self.jobs.get(job_id)
+            if old is not None:
+                self._unlink(job_id, old)
+            self.jobs[job_id] = record
+            for index, key in self._keys(user_name, job_data):
+                index[key].add(job_id)
+            if record["created_ts"] is not None:
+                bisect.insort(self.by_created, (record["created_ts"], job_id))
+
+    def _created_before(self, user_name: str, before: datetime) -> List[str]:
+        hi = bisect.bisect_left(self.by_created, (before.timestamp(),))
+        return [job_id for _, job_id in self.by_created[:hi] if self.jobs[job_id]["user"] == user_name]
+
+    def created_before(self, user_name: str, before: datetime) -> List[Dict]:
+        """Job data of a user's jobs created before a time, left in the index"""
+        with self._lock:
+            return [self.jobs[job_id]["job"] for job_id in self._created_before(user_name, before)]
+
+    def remove_created_before(self, user_name: str, before: datetime) -> List[Dict]:
+        """Drop a user's jobs created before a time from every index and return their job data"""
+        with self._lock:
+            job_ids = self._created_before(user_name, before)
+            removed = []
+            for job_id in job_ids:
+                record = self.jobs.pop(job_id)
+                self._unlink(job_id, record)
+                removed.append(record["job"])
+        return removed
+
+    def search(self, user_name: Optional[str] = None, tags: Optional[List[str]] = None,
+               program_id: Optional[str] = None, backend: Optional[str] = None,
+               status: Optional[str] = None, created_after: Optional[datetime] = None,
+               created_before: Optional[datetime] = None, limit: int = 100) -> Dict:
+        """Intersect the matching index buckets and return jobs newest first"""
+        with self._lock:
+            candidates = []
+            if user_name:
+                candidates.append(self.by_user.get(user_name, set()))
+            for tag in tags or []:
+                candidates.append(self.by_tag.get(tag, set()))
+            if program_id:
+                candidates.append(self.by_program.get(program_id, set()))
+            if backend:
+                candidates.append(self.by_backend.get(backend, set()))
+            if status:
+                candidates.append(self.by_status.get(status.upper(), set()))
+
+            if created_after or created_before:
+                lo = bisect.bisect_left(self.by_created, (created_after.timestamp(),)) if created_after else 0
+                hi = bisect.bisect_left(self.by_created, (created_before.timestamp(),)) if created_before else len(self.by_created)
+                candidates.append({job_id for _, job_id in self.by_created[lo:hi]})
+
+            if candidates:
+                candidates.sort(key=len)
+                matched = set(candidates[0]).intersection(*candidates[1:])
+            else:
+                matched = set(self.jobs)
+
+            records = [self.jobs[job_id] for job_id in matched]
+
+        records.sort(key=lambda r: r["created_ts"] or 0, reverse=True)
+        return {
+            "total_matches": len(records),
+            "jobs": [dict(r["job"], user=r["user"]) for r in records[:limit]]
+        }
+
+job_index = JobIndex()
+
+# ---------------------------
+# Job Result Cache
+# ---------------------------
+
+def extract_result_arrays(result) -> Dict[str, np.ndarray]:
+    """Flatten a PrimitiveResult into named NumPy arrays (counts per register, evs/stds)"""
+    arrays = {}
+    for pub_index, pub_result in enumerate(result):
+        data = pub_result.data
+        for field, value in data.items():
+            prefix = f"pub{pub_index}/{field}"
+            if hasattr(value, "get_counts"):
+                counts = value.get_counts()
+                arrays[f"{prefix}/bitstrings"] = np.array(list(counts.keys()), dtype=str)
+                arrays[f"{prefix}/counts"] = np.array(list(counts.values()), dtype=np.int64)
+            else:
+                try:
+                    arrays[prefix] = np.asarray(value, dtype=np.float64)
+                except (TypeError, ValueError):
+                    continue
+    return arrays
+
+def summarize_result_arrays(arrays: Dict[str, np.ndarray], top: Optional[int] = None) -> List[Dict]:
+    """Group cached arrays back into per-pub summaries for the API response"""
+    pubs = defaultdict(lambda: {"counts": {}, "values": {}})
+    for name, array in arrays.items():
+        parts = name.split("/")
+        pub = pubs[int(parts[0][3:])]
+        if len(parts) == 3 and parts[2] == "counts":
+            bitstrings = arrays[f"{parts[0]}/{parts[1]}/bitstrings"]
+            order = np.argsort(array)[::-1][:top] if top else np.argsort(array)[::-1]
+            pub["counts"][parts[1]] = {
+                "shots": int(array.sum()),
+                "distinct_outcomes": int(array.size),
+                "histogram": dict(zip(bitstrings[order].tolist(), array[order].tolist()))
+            }
+        elif len(parts) == 2:
+            pub["values"][parts[1]] = array.tolist()
+
+    return [dict(pub_index=index, **pubs[index]) for index in sorted(pubs)]
+
+class ResultCache:
+    """Content-addressed, compressed on-disk cache of job result arrays with LRU eviction by size"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "blobs")
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self._lock = threading.Lock()
+        # job_id -> {digest, size, last_access, owner}
+        self.manifest: Dict[str, Dict] = load_json(self.manifest_path, {})
+        # Identical results share a blob: jobs referencing each digest, and the bytes of distinct blobs
+        self._refs: Counter = Counter(entry["digest"] for entry in self.manifest.values())
+        self._total = sum({e["digest"]: e["size"] for e in self.manifest.values()}.values())
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, f"{digest}.npz")
+
+    def owner(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self.manifest.get(job_id)
+            return entry.get("owner") if entry else None
+
+    def get(self, job_id: str, owner: str) -> Optional[Dict[str, np.ndarray]]:
+        """Cached arrays of a job owned by `owner`; entries of other users are never returned.
+
+        The access time is only updated in memory; it reaches disk with the next put() or flush().
+        """
+        with self._lock:
+            entry = self.manifest.get(job_id)
+            if entry is None or entry.get("owner") != owner:
+                return None
+            try:
+                with np.load(self._blob_path(entry["digest"])) as blob:
+                    arrays = {name: blob[name] for name in blob.files}
+            except OSError:
+                self._unlink(job_id)
+                save_json_atomic(self.manifest_path, self.manifest)
+                return None
+            entry["last_access"] = time.time()
+            return arrays
+
+    def flush(self) -> None:
+        with self._lock:
+            save_json_atomic(self.manifest_path, self.manifest)
+
+    def put(self, job_id: str, arrays: Dict[str, np.ndarray], owner: str) -> str:
+        return self.put_many({job_id: arrays}, owner)[job_id]
+
+    def put_many(self, results: Dict[str, Dict[str, np.ndarray]], owner: str) -> Dict[str, str]:
+        """Cache several jobs' arrays, evicting and writing the manifest once for the batch"""
+        payloads = {}
+        for job_id, arrays in results.items():
+            buffer = io.BytesIO()
+            np.savez_compressed(buffer, **arrays)
+            payloads[job_id] = buffer.getvalue()
+
+        digests = {}
+        with self._lock:
+            os.makedirs(self.blob_dir, exist_ok=True)
+            now = time.time()
+            for job_id, payload in payloads.items():
+                digest = hashlib.sha256(payload).hexdigest()
+                path = self._blob_path(digest)
+                if not os.path.exists(path):
+                    with open(f"{path}.tmp", "wb") as f:
+                        f.write(payload)
+                    os.replace(f"{path}.tmp", path)
+                self._unlink(job_id)
+                self.manifest[job_id] = {"digest": digest, "size": len(payload), "last_access": now, "owner": owner}
+                if self._refs[digest] == 0:
+                    self._total += len(payload)
+                self._refs[digest] += 1
+                digests[job_id] = digest
+            self._evict()
+            save_json_atomic(self.manifest_path, self.manifest)
+        return digests
+
+    def _unlink(self, job_id: str) -> None:
+        """Drop a manifest entry, deleting its blob once no job references it"""
+        entry = self.manifest.pop(job_id, None)
+        if entry is None:
+            return
+        self._refs[entry["digest"]] -= 1
+        if self._refs[entry["digest"]] <= 0:
+            del self._refs[entry["digest"]]
+            self._total -= entry["size"]
+            try:
+                os.remove(self._blob_path(entry["digest"]))
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        if self._total <= self.max_bytes:
+            return
+        for job_id, _ in sorted(self.manifest.items(), key=lambda kv: kv[1]["last_access"]):
+            if self._total <= self.max_bytes:
+                break
+            self._unlink(job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "cached_jobs": len(self.manifest),
+                "blobs": len(self._refs),
+                "total_bytes": self._total,
+                "max_bytes": self.max_bytes
+            }
+
+result_cache = ResultCache(os.path.join(DATA_DIR, "results"), RESULT_CACHE_MAX_BYTES)
+
+def get_job_result_arrays(user: Dict, job_id: str) -> Dict[str, np.ndarray]:
+    """Result arrays for a job, fetched from IBM Quantum only on the first request"""
+    owner = result_cache.owner(job_id)
+    if owner is not None and owner != user["name"]:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found for {user['name']}")
+    arrays = result_cache.get(job_id, user["name"])
+    if arrays is not None:
+        return arrays
+
+    if job_id.startswith(LOCAL_JOB_PREFIX):
+        raise HTTPException(status_code=404, detail=f"Result of local job {job_id} is no longer cached")
+
+    service = get_service(user)
+    job = runtime_call("job", service.job, job_id)
+    status = runtime_call("status", job.status)
+    status_name = getattr(status, 'name', getattr(status, 'value', str(status)))
+    if status_name != "DONE":
+        # Only finished results are immutable and safe to cache
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {status_name}, result not available")
+
+    arrays = extract_result_arrays(runtime_call("result", job.result))
+    result_cache.put(job_id, arrays, user["name"])
+    return arrays
+
+def merge_counts(arrays_list: List[Dict[str, np.ndarray]], register: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Merge counts histograms from many results with one vectorized group-by"""
+    bitstrings, counts = [], []
+    for arrays in arrays_list:
+        for name, array in arrays.items():
+            parts = name.split("/")
+            if len(parts) == 3 and parts[2] == "counts" and (register is None or parts[1] == register):
+                bitstrings.append(arrays[f"{parts[0]}/{parts[1]}/bitstrings"])
+                counts.append(array)
+
+    if not counts:
+        return {"bitstrings": np.array([], dtype=str), "counts": np.array([], dtype=np.int64)}
+
+    unique, inverse = np.unique(np.concatenate(bitstrings), return_inverse=True)
+    merged = np.bincount(inverse, weights=np.concatenate(counts), minlength=unique.size).astype(np.int64)
+    order = np.argsort(merged)[::-1]
+    return {"bitstrings": unique[order], "counts": merged[order]}
+
+# ---------------------------
+# Circuit Structure Analysis
+# ---------------------------
+
+CIRCUIT_CACHE_PATH = os.path.join(DATA_DIR, "circuit_metrics.json")
+# Upper edges of the depth buckets used to correlate failures with circuit size
+CIRCUIT_DEPTH_BUCKETS = [50, 200, 1000]
+
+# Jobs kept in the circuit cache; the oldest are pruned past this, with circuits no job uses any more
+CIRCUIT_CACHE_MAX_JOBS = int(os.getenv("CIRCUIT_CACHE_MAX_JOBS", "20000"))
+# New entries are written out at most this often (and on shutdown)
+CIRCUIT_CACHE_FLUSH_SECONDS = float(os.getenv("CIRCUIT_CACHE_FLUSH_SECONDS", "5"))
+
+_circuit_cache_lock = threading.Lock()
+# circuits: circuit hash -> metrics, jobs: job_id -> circuit hashes of its pubs
+_circuit_cache: Dict[str, Dict] = load_json(CIRCUIT_CACHE_PATH, {"circuits": {}, "jobs": {}})
+_circuit_cache_dirty = False
+_circuit_cache_saved_at = 0.0
+_circuit_pool: Optional[ProcessPoolExecutor] = None
+
+def get_circuit_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all circuit analysis, created on first use"""
+    global _circuit_pool
+    if _circuit_pool is None:
+        _circuit_pool = ProcessPoolExecutor(max_workers=CIRCUIT_POOL_WORKERS)
+    return _circuit_pool
+
+def circuit_to_qpy(circuit: QuantumCircuit) -> bytes:
+    buffer = io.BytesIO()
+    qpy.dump(circuit, buffer)
+    return buffer.getvalue()
+
+def compute_circuit_metrics(qpy_bytes: bytes) -> Dict:
+    """Structure metrics for one QPY-serialized circuit (runs in a worker process)"""
+    circuit = qpy.load(io.BytesIO(qpy_bytes))[0]
+    gate_counts = {name: int(count) for name, count in circuit.count_ops().items()}
+    two_qubit_gates = sum(
+        1 for instruction in circuit.data
+        if instruction.operation.num_qubits == 2 and instruction.operation.name not in ("barrier", "measure")
+    )
+    return {
+        "width": circuit.num_qubits,
+        "clbits": circuit.num_clbits,
+        "depth": circuit.depth(),
+        "size": circuit.size(),
+        "two_qubit_gates": two_qubit_gates,
+        "gate_histogram": gate_counts
+    }
+
+def job_input_circuits(job) -> List[QuantumCircuit]:
+    """Circuits from a job's input pubs (bare circuits, tuples/lists or pub objects)"""
+    circuits = []
+    inputs = runtime_call("job_inputs", getattr, job, "inputs") or {}
+    for pub in inputs.get("pubs", []) or inputs.get("circuits", []):
+        if isinstance(pub, QuantumCircuit):
+            circuits.append(pub)
+        elif isinstance(pub, (tuple, list)) and pub and isinstance(pub[0], QuantumCircuit):
+            circuits.append(pub[0])
+        elif isinstance(getattr(pub, "circuit", None), QuantumCircuit):
+            circuits.append(pub.circuit)
+    return circuits
+
+def summarize_circuits(metrics: List[Dict]) -> Dict:
+    """Combine per-circuit metrics into one summary for a job"""
+    histogram = Counter()
+    for m in metrics:
+        histogram.update(m["gate_histogram"])
+    return {
+        "circuits": len(metrics),
+        "max_width": max((m["width"] for m in metrics), default=0),
+        "max_depth": max((m["depth"] for m in metrics), default=0),
+        "total_two_qubit_gates": sum(m["two_qubit_gates"] for m in metrics),
+        "gate_histogram": dict(histogram)
+    }
+
+def analyze_job_circuits(jobs: List) -> Dict[str, Dict]:
+    """Circuit summaries per job_id, computing only cache misses in the process pool"""
+    job_hashes: Dict[str, List[str]] = {}
+    pending: Dict[str, bytes] = {}
+
+    for job in jobs:
+        job_id = safe_get_attr(job, "job_id")
+        with _circuit_cache_lock:
+            known = _circuit_cache["jobs"].get(job_id)
+        if known is not None:
+            job_hashes[job_id] = known
+            continue
+        try:
+            circuits = job_input_circuits(job)
+        except Exception:
+            continue
+        hashes = []
+        for circuit in circuits:
+            qpy_bytes = circuit_to_qpy(circuit)
+            circuit_hash = hashlib.sha256(qpy_bytes).hexdigest()
+            hashes.append(circuit_hash)
+            with _circuit_cache_lock:
+                if circuit_hash not in _circuit_cache["circuits"]:
+                    pending[circuit_hash] = qpy_bytes
+        job_hashes[job_id] = hashes
+
+    computed = {}
+    if pending:
+        hashes = list(pending)
+        for circuit_hash, metrics in zip(hashes, get_circuit_pool().map(compute_circuit_metrics, [pending[h] for h in hashes])):
+            computed[circuit_hash] = metrics
+
+    global _circuit_cache_dirty
+    with _circuit_cache_lock:
+        _circuit_cache["circuits"].update(computed)
+        changed = bool(computed)
+        for job_id, hashes in job_hashes.items():
+            if job_id not in _circuit_cache["jobs"]:
+                _circuit_cache["jobs"][job_id] = hashes
+                changed = True
+        summaries = {
+            job_id: summarize_circuits([_circuit_cache["circuits"][h] for h in hashes if h in _circuit_cache["circuits"]])
+            for job_id, hashes in job_hashes.items()
+        }
+        if len(_circuit_cache["jobs"]) > CIRCUIT_CACHE_MAX_JOBS:
+            jobs = _circuit_cache["jobs"]
+            while len(jobs) > CIRCUIT_CACHE_MAX_JOBS:
+                del jobs[next(iter(jobs))]
+            used = {h for hashes in jobs.values() for h in hashes}
+            _circuit_cache["circuits"] = {h: m for h, m in _circuit_cache["circuits"].items() if h in used}
+        _circuit_cache_dirty = _circuit_cache_dirty or changed
+
+    if time.monotonic() - _circuit_cache_saved_at >= CIRCUIT_CACHE_FLUSH_SECONDS:
+        flush_circuit_cache()
+    return summaries
+
+def flush_circuit_cache() -> None:
+    """Write the circuit cache if it changed since the last write"""
+    global _circuit_cache_dirty, _circuit_cache_saved_at
+    with _circuit_cache_lock:
+        if not _circuit_cache_dirty:
+            return
+        save_json_atomic(CIRCUIT_CACHE_PATH, _circuit_cache)
+        _circuit_cache_dirty = False
+        _circuit_cache_saved_at = time.monotonic()
+
+def depth_bucket(depth: int) -> str:
+    lower = 0
+    for upper in CIRCUIT_DEPTH_BUCKETS:
+        if depth <= upper:
+            return f"depth_{lower}-{upper}"
+        lower = upper + 1
+    return f"depth_{lower}+"
+
+def correlation(xs: List[float], ys: List[float]) -> Optional[float]:
+    """Pearson correlation, or None when either series is too short or constant"""
+    if len(xs) < 2:
+        return None
+    x, y = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    if x.std() == 0 or y.std() == 0:
+        return None
+    return float(np.corrcoef(x, y)[0, 1])
+
+# ---------------------------
+# Backend Cache
+# ---------------------------
+
+_backend_cache_lock = threading.Lock()
+_backend_cache: Dict[str, Any] = {"expires": 0.0, "backends": []}
+_backend_status_cache: Dict[str, tuple] = {}
+
+def get_cached_backends() -> List:
+    """Backend objects from the first user's service, refreshed every BACKEND_CACHE_TTL seconds.
+
+    IBMBackend memoizes configuration(), properties() and target, so reusing the
+    objects also reuses those payloads until the next refresh.
+    """
+    with _backend_cache_lock:
+        if time.time() >= _backend_cache["expires"]:
+            _backend_cache["backends"] = list(runtime_call("backends", get_service(USERS[0]).backends))
+            _backend_cache["expires"] = time.time() + BACKEND_CACHE_TTL
+        return list(_backend_cache["backends"])
+
+def get_backend_status(backend):
+    """backend.status(), reused for BACKEND_STATUS_TTL seconds"""
+    now = time.time()
+    cached = _backend_status_cache.get(backend.name)
+    if cached and cached[0] > now:
+        return cached[1]
+    status = runtime_call("backend_status", backend.status)
+    _backend_status_cache[backend.name] = (now + BACKEND_STATUS_TTL, status)
+    return status
+
+def calibration_timestamp(backend) -> str:
+    """Identifier of the calibration a backend's properties belong to"""
+    try:
+        properties = runtime_call("backend_properties", backend.properties)
+        return str(getattr(properties, 'last_update_date', None) or "unknown")
+    except Exception:
+        return "unknown"
+
+# ---------------------------
+# Calibration Analytics
+# ---------------------------
+
+_TIME_UNITS = {"s": 1.0, "ms": 1e-3, "us": 1e-6, "µs": 1e-6, "ns": 1e-9}
+# Preferred gate for the per-qubit single-qubit error (rz is virtual and error-free)
+SINGLE_QUBIT_ERROR_GATES = ["sx", "x"]
+CALIBRATION_PERCENTILES = [10, 25, 50, 75, 90, 99]
+
+_calibration_cache_lock = threading.Lock()
+# (backend name, last_update_date) -> calibration arrays
+_calibration_cache: Dict[tuple, Dict] = {}
+
+def _nduv_seconds(nduv) -> float:
+    return float(nduv.value) * _TIME_UNITS.get(getattr(nduv, "unit", "s") or "s", 1.0)
+
+def calibration_arrays(properties) -> Dict[str, np.ndarray]:
+    """Per-qubit and per-edge calibration data from BackendProperties as NumPy arrays"""
+    n_qubits = len(properties.qubits)
+    t1 = np.full(n_qubits, np.nan)
+    t2 = np.full(n_qubits, np.nan)
+    readout = np.full(n_qubits, np.nan)
+    for q, nduvs in enumerate(properties.qubits):
+        for nduv in nduvs:
+            if nduv.name == "T1":
+                t1[q] = _nduv_seconds(nduv) * 1e6
+            elif nduv.name == "T2":
+                t2[q] = _nduv_seconds(nduv) * 1e6
+            elif nduv.name == "readout_error":
+                readout[q] = nduv.value
+
+    single_errors = {name: np.full(n_qubits, np.nan) for name in SINGLE_QUBIT_ERROR_GATES}
+    edge_errors: Dict[tuple, float] = {}
+    for gate in properties.gates:
+        error = next((p.value for p in gate.parameters if p.name == "gate_error"), None)
+        if error is None:
+            continue
+        if len(gate.qubits) == 1 and gate.gate in single_errors:
+            single_errors[gate.gate][gate.qubits[0]] = error
+        elif len(gate.qubits) == 2:
+            # Keep the better direction of a bidirectional edge
+            edge = tuple(sorted(gate.qubits))
+            edge_errors[edge] = min(error, edge_errors.get(edge, 1.0))
+
+    single = np.full(n_qubits, np.nan)
+    for name in reversed(SINGLE_QUBIT_ERROR_GATES):
+        values = single_errors[name]
+        single = np.where(np.isnan(values), single, values)
+
+    return {
+        "t1_us": t1,
+        "t2_us": t2,
+        "readout_error": readout,
+        "single_qubit_error": single,
+        "edges": np.array(list(edge_errors.keys()), dtype=np.int64).reshape(-1, 2),
+        "two_qubit_error": np.array(list(edge_errors.values()), dtype=np.float64)
+    }
+
+def get_calibration(backend) -> Optional[Dict]:
+    """Calibration arrays for a backend, computed once per backend and last_update_date"""
+    properties = runtime_call("backend_properties", backend.properties)
+    if properties is None:
+        return None
+    key = (backend.name, str(getattr(properties, 'last_update_date', None)))
+    with _calibration_cache_lock:
+        if key not in _calibration_cache:
+            # Drop arrays from older calibrations of the same backend
+            for stale in [k for k in _calibration_cache if k[0] == backend.name]:
+                del _calibration_cache[stale]
+            _calibration_cache[key] = dict(calibration_arrays(properties), last_update=key[1])
+        return _calibration_cache[key]
+
+def distribution_stats(values: np.ndarray, high_is_bad: bool = True) -> Dict:
+    """Distribution summary with IQR outliers on the bad side"""
+    finite = np.isfinite(values)
+    data = values[finite]
+    if data.size == 0:
+        return {"count": 0}
+    percentiles = np.percentile(data, CALIBRATION_PERCENTILES)
+    q1, q3 = np.percentile(data, [25, 75])
+    iqr = q3 - q1
+    indices = np.flatnonzero(finite)
+    if high_is_bad:
+        outliers = indices[data > q3 + 1.5 * iqr]
+    else:
+        outliers = indices[data < q1 - 1.5 * iqr]
+    return {
+        "count": int(data.size),
+        "mean": float(data.mean()),
+        "median": float(np.median(data)),
+        "min": float(data.min()),
+        "max": float(data.max()),
+        "percentiles": {f"p{p}": float(v) for p, v in zip(CALIBRATION_PERCENTILES, percentiles)},
+        "outliers": outliers.tolist()
+    }
+
+def calibration_report(calibration: Dict) -> Dict:
+    """Per-metric distributions for one backend; edge outliers are reported as qubit pairs"""
+    edges = calibration["edges"]
+    two_qubit = distribution_stats(calibration["two_qubit_error"])
+    if "outliers" in two_qubit:
+        two_qubit["outliers"] = edges[two_qubit["outliers"]].tolist()
+    return {
+        "last_update": calibration["last_update"],
+        "n_qubits": int(calibration["t1_us"].size),
+        "n_edges": int(edges.shape[0]),
+        "t1_us": distribution_stats(calibration["t1_us"], high_is_bad=False),
+        "t2_us": distribution_stats(calibration["t2_us"], high_is_bad=False),
+        "readout_error": distribution_stats(calibration["readout_error"]),
+        "single_qubit_error": distribution_stats(calibration["single_qubit_error"]),
+        "two_qubit_error": two_qubit
+    }
+
+# ---------------------------
+# Calibration History
+# ---------------------------
+
+HISTORY_QUBIT_METRICS = ["t1_us", "t2_us", "readout_error", "single_qubit_error"]
+HISTORY_METRICS = HISTORY_QUBIT_METRICS + ["two_qubit_error"]
+
+class CalibrationHistory:
+    """Deduplicated calibration snapshots, one directory of .npy arrays per backend per month.
+
+    Each month holds `timestamps` (S,), one (S, n_qubits) float32 array per qubit
+    metric and an (S, n_edges) `two_qubit_error` array whose columns follow `edges`.
+    Arrays are stored uncompressed so queries can memory-map them and only touch
+    the rows they need; a snapshot is appended only when last_update_date changes.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        # backend name -> epoch seconds of the newest stored snapshot
+        self._latest: Dict[str, float] = {}
+
+    def _month_dir(self, backend_name: str, month: str) -> str:
+        return os.path.join(self.root, backend_name, month)
+
+    def months(self, backend_name: str) -> List[str]:
+        try:
+            return sorted(os.listdir(os.path.join(self.root, backend_name)))
+        except OSError:
+            return []
+
+    def load_month(self, backend_name: str, month: str) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-mapped arrays for one backend month"""
+        directory = self._month_dir(backend_name, month)
+        try:
+            return {name[:-4]: np.load(os.path.join(directory, name), mmap_mode="r")
+                    for name in os.listdir(directory) if name.endswith(".npy")}
+        except (OSError, ValueError):
+            return None
+
+    def latest_timestamp(self, backend_name: str) -> float:
+        if backend_name not in self._latest:
+            latest = 0.0
+            for month in reversed(self.months(backend_name)):
+                arrays = self.load_month(backend_name, month)
+                if arrays and arrays.get("timestamps") is not None and arrays["timestamps"].size:
+                    latest = float(arrays["timestamps"][-1])
+                    break
+            self._latest[backend_name] = latest
+        return self._latest[backend_name]
+
+    def append(self, backend_name: str, updated: datetime, calibration: Dict) -> bool:
+        """Store a snapshot unless one with the same or a newer last_update_date exists"""
+        stamp = updated.timestamp()
+        with self._lock:
+            if stamp <= self.latest_timestamp(backend_name):
+                return False
+            month = updated.astimezone(timezone.utc).strftime("%Y-%m")
+            existing = self.load_month(backend_name, month) or {}
+            existing = {name: np.array(values) for name, values in existing.items()}
+            rows = int(existing["timestamps"].size) if "timestamps" in existing else 0
+
+            arrays = {"timestamps": np.append(existing.get("timestamps", np.empty(0)), stamp)}
+            for metric in HISTORY_QUBIT_METRICS:
+                arrays[metric] = _append_row(existing.get(metric), calibration[metric], rows)
+
+            # Edges can appear or disappear between calibrations; columns are the union seen this month
+            edges = [tuple(e) for e in existing.get("edges", np.empty((0, 2), dtype=np.int64)).tolist()]
+            column = {edge: i for i, edge in enumerate(edges)}
+            for edge in map(tuple, calibration["edges"].tolist()):
+                if edge not in column:
+                    column[edge] = len(edges)
+                    edges.append(edge)
+            row = np.full(len(edges), np.nan)
+            for edge, error in zip(map(tuple, calibration["edges"].tolist()), calibration["two_qubit_error"]):
+                row[column[edge]] = error
+            arrays["edges"] = np.array(edges, dtype=np.int64).reshape(-1, 2)
+            arrays["two_qubit_error"] = _append_row(existing.get("two_qubit_error"), row, rows)
+
+            directory = self._month_dir(backend_name, month)
+            os.makedirs(directory, exist_ok=True)
+            for name, values in arrays.items():
+                # Each file is replaced atomically, but not the month as a whole: a concurrent reader
+                # can see arrays one row apart, which snapshots_between clamps to the common rows
+                tmp_path = os.path.join(directory, f"{name}.tmp.npy")
+                np.save(tmp_path, values)
+                os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+            self._latest[backend_name] = stamp
+            return True
+
+    def snapshots_between(self, backend_name: str, start: datetime, end: datetime):
+        """Yield (month arrays, row slice) for the snapshots inside [start, end].
+
+        The slice stops at the fewest rows any of the month's arrays has, so a
+        snapshot being appended concurrently is left out rather than misaligned.
+        Edge columns only ever grow, so `edges` lines up with any row's prefix.
+        """
+        first, last = start.strftime("%Y-%m"), end.strftime("%Y-%m")
+        for month in self.months(backend_name):
+            if not first <= month <= last:
+                continue
+            arrays = self.load_month(backend_name, month)
+            if not arrays or "timestamps" not in arrays:
+                continue
+            timestamps = arrays["timestamps"]
+            lo = int(np.searchsorted(timestamps, start.timestamp(), side="left"))
+            hi = int(np.searchsorted(timestamps, end.timestamp(), side="right"))
+            hi = min([hi] + [values.shape[0] for name, values in arrays.items() if name != "edges"])
+            if hi > lo:
+                yield arrays, slice(lo, hi)
+
+def _append_row(previous: Optional[np.ndarray], row: np.ndarray, rows: int) -> np.ndarray:
+    """Append one snapshot row, NaN-padding whichever side has fewer columns"""
+    row = np.asarray(row, dtype=np.float32)
+    if previous is None or previous.size == 0:
+        previous = np.full((rows, row.size), np.nan, dtype=np.float32)
+    width = max(previous.shape[1], row.size)
+    if previous.shape[1] < width:
+        previous = np.hstack([previous, np.full((previous.shape[0], width - previous.shape[1]), np.nan, dtype=np.float32)])
+    if row.size < width:
+        row = np.concatenate([row, np.full(width - row.size, np.nan, dtype=np.float32)])
+    return np.vstack([previous, row[None, :]])
+
+calibration_history = CalibrationHistory(os.path.join(DATA_DIR, "calibration_history"))
+_collector_stop = threading.Event()
+
+def collect_calibration_history() -> int:
+    """Store a snapshot for every backend whose calibration changed since the last one"""
+    stored = 0
+    for backend in get_cached_backends():
+        try:
+            calibration = get_calibration(backend)
+            updated = parse_job_datetime(calibration["last_update"]) if calibration else None
+            if updated and calibration_history.append(backend.name, updated, calibration):
+                stored += 1
+        except Exception as e:
+            print(f"Calibration history collection failed for {getattr(backend, 'name', backend)}: {e}")
+    return stored
+
+def calibration_collector_loop():
+    while not _collector_stop.is_set():
+        try:
+            collect_calibration_history()
+        except Exception as e:
+            print(f"Calibration history collector error: {e}")
+        _collector_stop.wait(CALIBRATION_COLLECT_INTERVAL)
+
+def calibration_drift(backend_name: str, weeks: int) -> Dict:
+    """Weekly medians of each calibration metric plus the qubits whose coherence dropped the most"""
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(weeks=weeks)
+    # ISO week -> metric -> per-snapshot medians across qubits/edges
+    weekly: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    # metric -> ISO week -> list of per-qubit rows (aggregated to a per-qubit median per week)
+    per_qubit: Dict[str, Dict[str, List[np.ndarray]]] = {m: defaultdict(list) for m in ("t1_us", "t2_us")}
+    snapshots = 0
+
+    for arrays, rows in calibration_history.snapshots_between(backend_name, start, end):
+        weeks_of_rows = [
+            "%d-W%02d" % datetime.fromtimestamp(float(ts), timezone.utc).isocalendar()[:2]
+            for ts in arrays["timestamps"][rows]
+        ]
+        snapshots += len(weeks_of_rows)
+        for metric in HISTORY_METRICS:
+            if metric not in arrays:
+                continue
+            block = np.asarray(arrays[metric][rows], dtype=np.float64)
+            with np.errstate(all="ignore"):
+                medians = np.nanmedian(np.where(np.isfinite(block), block, np.nan), axis=1) if block.shape[1] else np.full(block.shape[0], np.nan)
+            for week, value in zip(weeks_of_rows, medians.tolist()):
+                if math.isfinite(value):
+                    weekly[week][metric].append(value)
+            if metric in per_qubit:
+                for week, row in zip(weeks_of_rows, block):
+                    per_qubit[metric][week].append(row)
+
+    ordered_weeks = sorted(weekly)
+    metrics = {}
+    for metric in HISTORY_METRICS:
+        points = [{"week": week, "snapshots": len(weekly[week][metric]), "median": float(np.median(weekly[week][metric]))}
+                  for week in ordered_weeks if weekly[week][metric]]
+        summary = {"weekly": points}
+        if len(points) >= 2:
+            first, last = points[0]["median"], points[-1]["median"]
+            slope = np.polyfit(np.arange(len(points)), [p["median"] for p in points], 1)[0]
+            summary["change_percent"] = round((last - first) / first * 100, 2) if first else None
+            summary["slope_per_week"] = float(slope)
+        metrics[metric] = summary
+
+    # Qubits whose coherence fell the most between the first and last week with data
+    degrading = {}
+    for metric, by_week in per_qubit.items():
+        filled = [w for w in ordered_weeks if by_week.get(w)]
+        if len(filled) < 2:
+            continue
+        with np.errstate(all="ignore"):
+            first = np.nanmedian(np.vstack(by_week[filled[0]]), axis=0)
+            last = np.nanmedian(np.vstack(by_week[filled[-1]]), axis=0)
+            width = min(first.size, last.size)
+            change = (last[:width] - first[:width]) / first[:width] * 100
+        valid = np.flatnonzero(np.isfinite(change))
+        worst = valid[np.argsort(change[valid])][:5]
+        degrading[metric] = [{"qubit": int(q), "change_percent": round(float(change[q]), 2)} for q in worst if change[q] < 0]
+
+    return {
+        "backend": backend_name,
+        "period": {"start": start.isoformat(), "end": end.isoformat(), "weeks": weeks},
+        "snapshots": snapshots,
+        "metrics": metrics,
+        "most_degraded_qubits": degrading
+    }
+
+# ---------------------------
+# Best Qubit Subset
+# ---------------------------
+
+_layout_cache_lock = threading.Lock()
+# (backend name, last_update_date, width) -> best layout
+_layout_cache: Dict[tuple, Optional[Dict]] = {}
+
+def _infidelity_cost(errors: np.ndarray) -> np.ndarray:
+    """-log(1 - error), so costs add where fidelities multiply; missing data counts as a bad qubit"""
+    errors = np.where(np.isfinite(errors), errors, 0.5)
+    return -np.log1p(-np.clip(errors, 0.0, 1 - 1e-12))
+
+def calibration_graph(calibration: Dict, coupling_map: List) -> rx.PyGraph:
+    """Undirected coupling graph with node costs (readout + 1q error) and edge costs (2q error)"""
+    node_costs = _infidelity_cost(calibration["readout_error"]) + _infidelity_cost(calibration["single_qubit_error"])
+    edge_costs = dict(zip(map(tuple, calibration["edges"].tolist()), _infidelity_cost(calibration["two_qubit_error"]).tolist()))
+
+    graph = rx.PyGraph(multigraph=False)
+    graph.add_nodes_from(node_costs.tolist())
+    for a, b in coupling_map:
+        edge = (min(a, b), max(a, b))
+        if a < len(node_costs) and b < len(node_costs) and not graph.has_edge(*edge):
+            # Couplings without calibration data are treated like a poor edge
+            graph.add_edge(edge[0], edge[1], edge_costs.get(edge, float(_infidelity_cost(np.array([0.5]))[0])))
+    return graph
+
+def best_qubit_subset(graph: rx.PyGraph, width: int) -> Optional[Dict]:
+    """Lowest-cost connected subgraph of `width` qubits, grown greedily from every seed qubit.
+
+    Cost is the sum of node costs plus the cheapest spanning tree of couplings
+    inside the subset, i.e. what a linear/tree-shaped circuit layout would use.
+    """
+    if width < 1 or width > graph.num_nodes():
+        return None
+
+    best = None
+    for seed in graph.node_indices():
+        subset = [seed]
+        members = {seed}
+        cost = graph[seed]
+        # Cheapest known edge into the subset for every frontier qubit
+        frontier: Dict[int, float] = dict(graph.adj(seed))
+        while len(subset) < width and frontier:
+            nxt = min(frontier, key=lambda q: graph[q] + frontier[q])
+            cost += graph[nxt] + frontier.pop(nxt)
+            subset.append(nxt)
+            members.add(nxt)
+            for neighbor, edge_cost in graph.adj(nxt).items():
+                if neighbor not in members and edge_cost < frontier.get(neighbor, float("inf")):
+                    frontier[neighbor] = edge_cost
+            if best is not None and cost >= best[0]:
+                break
+        if len(subset) == width and (best is None or cost < best[0]):
+            best = (cost, subset)
+
+    if best is None:
+        return None
+
+    order = sorted(best[1])
+    subgraph = graph.subgraph(order)
+    tree = rx.minimum_spanning_edges(subgraph, weight_fn=float)
+    cost = sum(graph[q] for q in order) + sum(edge_cost for _, _, edge_cost in tree)
+    return {
+        "qubits": order,
+        "edges": [[order[a], order[b]] for a, b, _ in tree],
+        "estimated_fidelity": math.exp(-cost),
+        "cost": cost
+    }
+
+def get_best_layout(backend, width: int) -> Optional[Dict]:
+    """Best qubit subset for a backend, cached per calibration and width"""
+    calibration = get_calibration(backend)
+    if calibration is None:
+        return None
+    key = (backend.name, calibration["last_update"], width)
+    with _layout_cache_lock:
+        if key in _layout_cache:
+            return _layout_cache[key]
+
+    coupling_map = getattr(runtime_call("backend_configuration", backend.configuration), 'coupling_map', None) or calibration["edges"].tolist()
+    layout = best_qubit_subset(calibration_graph(calibration, coupling_map), width)
+
+    with _layout_cache_lock:
+        for stale in [k for k in _layout_cache if k[0] == backend.name and k[1] != key[1]]:
+            del _layout_cache[stale]
+        _layout_cache[key] = layout
+    return layout
+
+# ---------------------------
+# Pre-submission Estimator
+# ---------------------------
+
+TRANSPILE_OPTIMIZATION_LEVEL = 2
+# Rough queue drain rate used to turn pending_jobs into a wait estimate
+QUEUE_SECONDS_PER_PENDING_JOB = float(os.environ.get("QUEUE_SECONDS_PER_PENDING_JOB", 60))
+ESTIMATE_CACHE_SIZE = 2048
+
+_estimate_cache_lock = threading.Lock()
+# (circuit hash, backend name, calibration timestamp) -> transpiled circuit estimate
+_estimate_cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+
+def load_qasm(source: str) -> QuantumCircuit:
+    """Parse OpenQASM 2 (or 3, when qiskit-qasm3-import is installed)"""
+    if "OPENQASM 3" in source:
+        from qiskit import qasm3
+        return qasm3.loads(source)
+    return qasm2.loads(source, custom_instructions=qasm2.LEGACY_CUSTOM_INSTRUCTIONS)
+
+def estimate_on_target(source: str, target) -> Dict:
+    """Transpile against a backend target and estimate duration and success (runs in a worker process)"""
+    circuit = transpile(load_qasm(source), target=target, optimization_level=TRANSPILE_OPTIMIZATION_LEVEL, seed_transpiler=0)
+
+    log_success = 0.0
+    qubit_time = defaultdict(float)
+    for instruction in circuit.data:
+        name = instruction.operation.name
+        if name == "barrier":
+            continue
+        qargs = tuple(circuit.find_bit(q).index for q in instruction.qubits)
+        props = target[name].get(qargs) if name in target else None
+        duration = 0.0
+        if props is not None:
+            if props.error:
+                log_success += math.log1p(-min(props.error, 1 - 1e-12))
+            duration = props.duration or 0.0
+        # ASAP schedule: an instruction starts once all of its qubits are free
+        start = max((qubit_time[q] for q in qargs), default=0.0)
+        for q in qargs:
+            qubit_time[q] = start + duration
+
+    return {
+        "transpiled_depth": circuit.depth(),
+        "transpiled_size": circuit.size(),
+        "two_qubit_gates": sum(1 for i in circuit.data if i.operation.num_qubits == 2 and i.operation.name != "barrier"),
+        "circuit_duration_seconds": max(qubit_time.values(), default=0.0),
+        "success_probability": math.exp(log_success)
+    }
+
+def estimate_backends(source: str, backends: List, shots: int) -> List[Dict]:
+    """Estimates for each backend, transpiling cache misses in parallel"""
+    circuit_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    estimates, futures = {}, {}
+
+    for backend in backends:
+        key = (circuit_hash, backend.name, calibration_timestamp(backend))
+        with _estimate_cache_lock:
+            if key in _estimate_cache:
+                _estimate_cache.move_to_end(key)
+                estimates[backend.name] = dict(_estimate_cache[key], cached=True)
+                continue
+        try:
+            futures[key] = get_circuit_pool().submit(estimate_on_target, source,
+                                                    runtime_call("backend_target", getattr, backend, "target"))
+        except Exception as e:
+            estimates[backend.name] = {"error": str(e)}
+
+    for key, future in futures.items():
+        try:
+            estimate = future.result()
+        except Exception as e:
+            estimates[key[1]] = {"error": str(e)}
+            continue
+        with _estimate_cache_lock:
+            _estimate_cache[key] = estimate
+            while len(_estimate_cache) > ESTIMATE_CACHE_SIZE:
+                _estimate_cache.popitem(last=False)
+        estimates[key[1]] = dict(estimate, cached=False)
+
+    ranked = []
+    for backend in backends:
+        estimate = estimates.get(backend.name, {})
+        if "error" in estimate:
+            ranked.append({"backend_name": backend.name, **estimate})
+            continue
+        try:
+            config = runtime_call("backend_configuration", backend.configuration)
+            rep_delay = getattr(config, 'default_rep_delay', None) or 250e-6
+            pending_jobs = getattr(get_backend_status(backend), 'pending_jobs', 0) or 0
+        except Exception:
+            rep_delay, pending_jobs = 250e-6, 0
+
+        execution_seconds = shots * (estimate["circuit_duration_seconds"] + rep_delay)
+        queue_seconds = pending_jobs * QUEUE_SECONDS_PER_PENDING_JOB
+        completion_seconds = queue_seconds + execution_seconds
+        ranked.append({
+            "backend_name": backend.name,
+            "calibration": calibration_timestamp(backend),
+            **estimate,
+            "pending_jobs": pending_jobs,
+            "estimated_execution_seconds": execution_seconds,
+            "estimated_queue_seconds": queue_seconds,
+            "estimated_completion_seconds": completion_seconds,
+            # Success probability discounted by one step per hour of expected turnaround
+            "score": estimate["success_probability"] / (1 + completion_seconds / 3600)
+        })
+
+    ranked.sort(key=lambda r: r.get("score", -1), reverse=True)
+    return ranked
+
+# ---------------------------
+# Streaming Percentile Sketches
+# ---------------------------
+
+SKETCH_METRICS = ["seconds", "quantum_seconds", "queue_wait_seconds"]
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_MAX_BUCKETS = 2048
+
+class QuantileSketch:
+    """Mergeable log-bucket quantile sketch (DDSketch style) for non-negative values.
+
+    Quantiles are within SKETCH_RELATIVE_ACCURACY of the true value, and memory
+    is bounded by SKETCH_MAX_BUCKETS regardless of how many values are added.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY, max_buckets: int = SKETCH_MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, value: float, count: int = 1) -> None:
+        value = max(float(value), 0.0)
+        if value == 0.0:
+            self.zero_count += count
+        else:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[key] = self.buckets.get(key, 0) + count
+            self._collapse()
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _collapse(self) -> None:
+        # Fold the smallest buckets together; the tail we care about keeps full accuracy
+        while len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "buckets": [[key, count] for key, count in sorted(self.buckets.items())],
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuantileSketch":
+        sketch = cls()
+        sketch.buckets = {int(key): count for key, count in data["buckets"]}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"] if data["min"] is not None else float("inf")
+        sketch.max = data["max"]
+        return sketch
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else None
+        }
+
+_sketch_lock = threading.Lock()
+# (user, backend, metric) -> sketch
+_sketches: Dict[tuple, QuantileSketch] = {}
+
+def job_queue_wait_seconds(job_data: Dict) -> Optional[float]:
+    """Seconds between creation and start of execution, from the job metrics timestamps"""
+    timestamps = (job_data.get("metrics") or {}).get("timestamps") or {}
+    created = parse_job_datetime(timestamps.get("created"))
+    running = parse_job_datetime(timestamps.get("running"))
+    if created and running:
+        return max((running - created).total_seconds(), 0.0)
+    return None
+
+def record_job_latencies(user_name: str, job_data: Dict) -> None:
+    """Add a terminal job's queue wait, and a DONE job's usage, to the per-user, per-backend sketches"""
+    usage = (job_data.get("usage") or {}) if job_data.get("status") == "DONE" else {}
+    values = {
+        "seconds": usage.get("seconds"),
+        "quantum_seconds": usage.get("quantum_seconds"),
+        "queue_wait_seconds": job_queue_wait_seconds(job_data)
+    }
+    with _sketch_lock:
+        for metric, value in values.items():
+            if value is None:
+                continue
+            key = (user_name, job_data.get("backend", "Unknown"), metric)
+            if key not in _sketches:
+                _sketches[key] = QuantileSketch()
+            _sketches[key].add(value)
+
+def merged_sketch(metric: str, user_name: Optional[str] = None, backend: Optional[str] = None) -> QuantileSketch:
+    """Merge the sketches matching a user and/or backend (all of them when unset)"""
+    merged = QuantileSketch()
+    with _sketch_lock:
+        for (sketch_user, sketch_backend, sketch_metric), sketch in _sketches.items():
+            if sketch_metric != metric:
+                continue
+            if user_name and sketch_user != user_name:
+                continue
+            if backend and sketch_backend != backend:
+                continue
+            merged.merge(sketch)
+    return merged
+
+# ---------------------------
+# Batched Job Submission
+# ---------------------------
+
+# Circuits for the same user, backend and mode arriving within this window share one Batch/Session
+SUBMIT_BATCH_WINDOW = float(os.environ.get("SUBMIT_BATCH_WINDOW", 10))
+SUBMIT_MAX_PUBS_PER_JOB = 100
+# Execution mode and primitive classes are looked up here so a local stand-in can replace them
+EXECUTION_MODES = {"batch": Batch, "session": Session}
+SAMPLER_CLASS = SamplerV2
+SUBMISSION_HISTORY = 10000
+
+_submission_lock = threading.Lock()
+# submission_id -> {user, backend, mode, shots, status, job_id, pub_index, error}
+_submissions: Dict[str, Dict] = {}
+# (user, backend, mode) -> pending circuits waiting for the window to close
+_pending_submissions: Dict[tuple, List[Dict]] = {}
+
+def queue_submission(user: Dict, backend_name: str, mode: str, qasm: str, shots: int) -> Dict:
+    """Add a circuit to the open window for its (user, backend, mode), opening one if needed"""
+    submission_id = uuid.uuid4().hex[:12]
+    key = (user["name"], backend_name, mode)
+    with _submission_lock:
+        # Forget the oldest finished submissions beyond SUBMISSION_HISTORY
+        for old_id in list(_submissions)[:max(len(_submissions) - SUBMISSION_HISTORY, 0)]:
+            if _submissions[old_id]["status"] in ("SUBMITTED", "FAILED"):
+                del _submissions[old_id]
+        _submissions[submission_id] = {
+            "submission_id": submission_id,
+            "user": user["name"],
+            "backend": backend_name,
+            "mode": mode,
+            "shots": shots,
+            "status": "PENDING",
+            "job_id": None,
+            "pub_index": None,
+            "error": None,
+            "queued_at": datetime.now().isoformat()
+        }
+        if key not in _pending_submissions:
+            _pending_submissions[key] = []
+            timer = threading.Timer(SUBMIT_BATCH_WINDOW, flush_submissions, args=(user, key))
+            timer.daemon = True
+            timer.start()
+        _pending_submissions[key].append({"submission_id": submission_id, "qasm": qasm, "shots": shots})
+        return dict(_submissions[submission_id])
+
+def _update_submissions(submission_ids: List[str], **fields) -> None:
+    with _submission_lock:
+        for submission_id in submission_ids:
+            _submissions[submission_id].update(fields)
+
+def flush_submissions(user: Dict, key: tuple) -> None:
+    """Transpile a closed window's circuits and run them as jobs inside one Batch/Session"""
+    with _submission_lock:
+        items = _pending_submissions.pop(key, [])
+    if not items:
+        return
+    _, backend_name, mode = key
+    submission_ids = [item["submission_id"] for item in items]
+    _update_submissions(submission_ids, status="SUBMITTING")
+
+    try:
+        service = get_service(user)
+        backend = runtime_call("service_backend", service.backend, backend_name)
+        target = runtime_call("backend_target", getattr, backend, "target")
+        # One task per window, so the (possibly large) Target is pickled into the pool once
+        circuits = get_circuit_pool().submit(transpile_for_target, [item["qasm"] for item in items], target).result()
+        with runtime_call("open_" + mode, EXECUTION_MODES[mode], backend=backend) as execution_mode:
+            sampler = SAMPLER_CLASS(mode=execution_mode)
+            for start in range(0, len(items), SUBMIT_MAX_PUBS_PER_JOB):
+                chunk = items[start:start + SUBMIT_MAX_PUBS_PER_JOB]
+                pubs = [(circuit, None, item["shots"]) for circuit, item in zip(circuits[start:start + len(chunk)], chunk)]
+                job = runtime_call("submit", sampler.run, pubs)
+                job_data = ingest_job(user, job)
+                for pub_index, item in enumerate(chunk):
+                    _update_submissions([item["submission_id"]], status="SUBMITTED",
+                                        job_id=job_data.get("job_id"), pub_index=pub_index)
+    except Exception as e:
+        with _submission_lock:
+            for submission_id in submission_ids:
+                if _submissions[submission_id]["status"] != "SUBMITTED":
+                    _submissions[submission_id].update(status="FAILED", error=str(e))
+
+def transpile_for_target(sources: List[str], target) -> List[QuantumCircuit]:
+    """Parse and lower a window's circuits to the backend's ISA in one call (runs in a worker process)"""
+    return transpile([load_qasm(source) for source in sources], target=target,
+                     optimization_level=TRANSPILE_OPTIMIZATION_LEVEL)
+
+# ---------------------------
+# Local Simulator
+# ---------------------------
+
+LOCAL_BACKEND = "local"
+LOCAL_JOB_PREFIX = "local-"
+LOCAL_RESULT_CACHE_SIZE = 1024
+LOCAL_JOB_HISTORY = 500
+
+_local_lock = threading.Lock()
+# (circuit digest, shots, observables) -> result arrays, least recently used first
+_local_results: "OrderedDict[tuple, Dict[str, np.ndarray]]" = OrderedDict()
+# user -> job_id -> job data, oldest first
+_local_jobs: Dict[str, "OrderedDict[str, Dict]"] = defaultdict(OrderedDict)
+
+def prepare_local_circuit(source: str, observables: Optional[List[str]]) -> tuple:
+    """Parse a circuit for the local path and return (qpy bytes, digest); ValueError if it does not fit"""
+    circuit = load_qasm(source)
+    if circuit.num_qubits > LOCAL_MAX_QUBITS or circuit.depth() > LOCAL_MAX_DEPTH:
+        raise ValueError(
+            f"Circuit has {circuit.num_qubits} qubits and depth {circuit.depth()}; the local backend "
+            f"accepts at most {LOCAL_MAX_QUBITS} qubits and depth {LOCAL_MAX_DEPTH}"
+        )
+    for observable in observables or []:
+        if len(observable) != circuit.num_qubits or set(observable) - set("IXYZ"):
+            raise ValueError(f"Observable {observable!r} must be a Pauli string over {circuit.num_qubits} qubits")
+    # Parsers number circuit names per call, which would defeat hashing identical circuits
+    circuit.name = "circuit"
+    qpy_bytes = circuit_to_qpy(circuit)
+    return qpy_bytes, hashlib.sha256(qpy_bytes).hexdigest()
+
+def run_local_primitive(qpy_bytes: bytes, shots: int, observables: Optional[List[str]]) -> Tuple[Dict[str, np.ndarray], float, float]:
+    """Run one circuit on the statevector Sampler, or Estimator when observables are given (runs in a worker process).
+
+    Returns the result arrays with the epoch times the run started and finished.
+    """
+    started = time.time()
+    circuit = qpy.load(io.BytesIO(qpy_bytes))[0]
+    if observables:
+        circuit = circuit.remove_final_measurements(inplace=False)
+        result = StatevectorEstimator().run([(circuit, [SparsePauliOp(o) for o in observables])]).result()
+    else:
+        if circuit.num_clbits == 0:
+            circuit = circuit.measure_all(inplace=False)
+        result = StatevectorSampler().run([(circuit, None, shots)]).result()
+    return extract_result_arrays(result), started, time.time()
+
+def run_local_jobs(user: Dict, items: List[Dict]) -> List[Dict]:
+    """Run prepared circuits locally (cached by circuit hash, shots and observables) and record them as jobs.
+
+    Each job is timed on its own: created when submitted to the pool, running
+    and finished as measured by the worker. Cached results take no time.
+    """
+    keys = [(item["digest"], item["shots"], tuple(item["observables"] or ())) for item in items]
+    with _local_lock:
+        cached = {key: _local_results[key] for key in keys if key in _local_results}
+        for key in cached:
+            _local_results.move_to_end(key)
+
+    futures = {}
+    submitted = {}
+    for item, key in zip(items, keys):
+        if key not in cached and key not in futures:
+            submitted[key] = datetime.now(timezone.utc)
+            futures[key] = get_circuit_pool().submit(run_local_primitive, item["qpy"], item["shots"], item["observables"])
+
+    jobs = []
+    results = {}
+    for item, key in zip(items, keys):
+        error_message = None
+        arrays = cached.get(key)
+        created = submitted.get(key) or datetime.now(timezone.utc)
+        running = finished = created
+        if arrays is None:
+            try:
+                arrays, started, ended = futures[key].result()
+                running = datetime.fromtimestamp(started, timezone.utc)
+                finished = datetime.fromtimestamp(ended, timezone.utc)
+                with _local_lock:
+                    _local_results[key] = arrays
+                    while len(_local_results) > LOCAL_RESULT_CACHE_SIZE:
+                        _local_results.popitem(last=False)
+            except Exception as e:
+                error_message = f"Local simulation failed: {e}"
+                finished = datetime.now(timezone.utc)
+        elapsed = (finished - running).total_seconds()
+
+        job_id = f"{LOCAL_JOB_PREFIX}{uuid.uuid4().hex[:16]}"
+        if arrays is not None:
+            results[job_id] = arrays
+        usage = {"quantum_seconds": 0, "seconds": round(elapsed, 6)}
+        job_data = record_job_data(user, {
+            "job_id": job_id,
+            "status": "DONE" if error_message is None else "ERROR",
+            "backend": LOCAL_BACKEND,
+            "creation_date": created.isoformat(),
+            "program_id": "estimator" if item["observables"] else "sampler",
+            "tags": list(item.get("tags") or []),
+            "usage": usage,
+            "metrics": {
+                "timestamps": {"created": created.isoformat(), "running": running.isoformat(), "finished": finished.isoformat()},
+                "usage": usage,
+                "cached_result": key in cached
+            },
+            "queue_info": {},
+            "error_message": error_message
+        })
+        with _local_lock:
+            history = _local_jobs[user["name"]]
+            history[job_id] = job_data
+            while len(history) > LOCAL_JOB_HISTORY:
+                history.popitem(last=False)
+        jobs.append(job_data)
+    if results:
+        # One manifest write for the whole batch
+        result_cache.put_many(results, user["name"])
+    return jobs
+
+def local_jobs_for(user_name: str, limit: int) -> List[Dict]:
+    """Most recent local jobs of a user, newest first"""
+    with _local_lock:
+        return [dict(job) for job in reversed(list(_local_jobs.get(user_name, {}).values()))][:limit]
+
+# ---------------------------
+# Change Sequence (delta sync)
+# ---------------------------
+
+# Minimum seconds between upstream refreshes of one user's jobs for delta polling
+DELTA_REFRESH_INTERVAL = 5
+
+class ChangeLog:
+    """Monotonic change sequence over ingested jobs, used to answer "what changed since cursor" """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Cursors from a previous server process carry a different epoch and force a resync
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        # user -> job_id -> seq of its latest change, ordered by seq
+        self.by_user: Dict[str, "OrderedDict[str, int]"] = defaultdict(OrderedDict)
+
+    def record(self, user_name: str, job_id: str) -> int:
+        with self._lock:
+            self.seq += 1
+            changes = self.by_user[user_name]
+            changes[job_id] = self.seq
+            changes.move_to_end(job_id)
+            return self.seq
+
+    def forget(self, user_name: str, job_ids: List[str]) -> None:
+        """Stop reporting jobs that are no longer kept raw; bumping seq refreshes the columnar frame"""
+        with self._lock:
+            self.seq += 1
+            changes = self.by_user.get(user_name, {})
+            for job_id in job_ids:
+                changes.pop(job_id, None)
+
+    def since(self, user_name: str, seq: int) -> tuple:
+        """(job_id, seq) pairs changed after seq, oldest change first, and the current sequence"""
+        with self._lock:
+            changed = []
+            for job_id, job_seq in reversed(self.by_user.get(user_name, {}).items()):
+                if job_seq <= seq:
+                    break
+                changed.append((job_id, job_seq))
+            changed.reverse()
+            return changed, self.seq
+
+    def encode_cursor(self, seq: int) -> str:
+        return base64.urlsafe_b64encode(f"{self.epoch}:{seq}".encode()).decode()
+
+    def decode_cursor(self, cursor: Optional[str]) -> Optional[int]:
+        """Sequence number of a cursor, or None if it is missing, malformed or from another epoch"""
+        if not cursor:
+            return None
+        try:
+            epoch, seq = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+            return int(seq) if epoch == self.epoch else None
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+change_log = ChangeLog()
+_user_refresh_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+_user_last_refresh: Dict[str, float] = {}
+
+def refresh_user_jobs(user: Dict, limit: int) -> None:
+    """Re-list a user's recent jobs at most every DELTA_REFRESH_INTERVAL seconds.
+
+    Concurrent pollers of the same user share one refresh, and jobs already
+    indexed in a terminal state are skipped without any per-job calls.
+    """
+    with _user_refresh_locks[user["name"]]:
+        if time.time() - _user_last_refresh.get(user["name"], 0) < DELTA_REFRESH_INTERVAL:
+            return
+        service = get_service(user)
+        for job in list_jobs(service, limit=limit):
+            ingest_job(user, job)
+        _user_last_refresh[user["name"]] = time.time()
+
+# ---------------------------
+# Ad-hoc Aggregation Queries
+# ---------------------------
+
+QUERY_DIMENSIONS = ["user", "backend", "status", "program_id", "tag", "day", "hour"]
+QUERY_FIELDS = ["seconds", "quantum_seconds", "queue_wait_seconds"]
+_AGGREGATE_PATTERN = re.compile(r"^(count|sum|mean|min|max|p\d{1,2}(?:\.\d+)?):?(\w*)$")
+
+_job_frame_lock = threading.Lock()
+# Columnar copy of the job index, rebuilt only when the change sequence moves
+_job_frame_cache: Dict[str, Any] = {"seq": -1, "frame": None}
+
+def build_job_frame() -> Dict[str, Any]:
+    """Columnar NumPy view of every indexed job"""
+    with job_index._lock:
+        records = list(job_index.jobs.items())
+
+    frame = {
+        "job_id": np.array([job_id for job_id, _ in records], dtype=object),
+        "user": np.array([r["user"] for _, r in records], dtype=object),
+        "backend": np.array([str(r["job"].get("backend")) for _, r in records], dtype=object),
+        "status": np.array([str(r["job"].get("status")) for _, r in records], dtype=object),
+        "program_id": np.array([str(r["job"].get("program_id")) for _, r in records], dtype=object),
+        "created_ts": np.array([r["created_ts"] if r["created_ts"] is not None else np.nan for _, r in records], dtype=np.float64),
+        "tags": [list(r["job"].get("tags") or []) or ["(none)"] for _, r in records],
+    }
+    created = [datetime.fromtimestamp(ts, timezone.utc) if np.isfinite(ts) else None for ts in frame["created_ts"]]
+    frame["day"] = np.array([d.strftime('%Y-%m-%d') if d else "Unknown" for d in created], dtype=object)
+    frame["hour"] = np.array([f"hour_{d.hour}" if d else "Unknown" for d in created], dtype=object)
+
+    for field in QUERY_FIELDS:
+        values = []
+        for _, r in records:
+            if field == "queue_wait_seconds":
+                value = job_queue_wait_seconds(r["job"])
+            else:
+                value = (r["job"].get("usage") or {}).get(field)
+            values.append(float(value) if value is not None else np.nan)
+        frame[field] = np.array(values, dtype=np.float64)
+    return frame
+
+def get_job_frame() -> Dict[str, Any]:
+    with _job_frame_lock:
+        if _job_frame_cache["seq"] != change_log.seq or _job_frame_cache["frame"] is None:
+            _job_frame_cache["seq"] = change_log.seq
+            _job_frame_cache["frame"] = build_job_frame()
+        return _job_frame_cache["frame"]
+
+def parse_aggregate(spec: str) -> tuple:
+    """'count', 'sum:seconds', 'mean:quantum_seconds', 'p90:queue_wait_seconds' -> (op, field)"""
+    match = _AGGREGATE_PATTERN.match(spec.strip())
+    if not match:
+        raise ValueError(f"Invalid aggregate '{spec}'")
+    op, field = match.groups()
+    if op == "count":
+        return op, None
+    if field not in QUERY_FIELDS:
+        raise ValueError(f"Aggregate '{spec}' needs a field from {QUERY_FIELDS}")
+    if op.startswith("p") and not 0 <= float(op[1:]) <= 100:
+        raise ValueError(f"Percentile out of range in '{spec}'")
+    return op, field
+
+def grouped_percentile(values: np.ndarray, group_ids: np.ndarray, n_groups: int, q: float) -> np.ndarray:
+    """Linear-interpolated percentile of values per group, NaN for empty groups"""
+    valid = np.isfinite(values)
+    values, group_ids = values[valid], group_ids[valid]
+    order = np.lexsort((values, group_ids))
+    values, group_ids = values[order], group_ids[order]
+    counts = np.bincount(group_ids, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = np.full(n_groups, np.nan)
+    has_data = counts > 0
+    position = starts[has_data] + (counts[has_data] - 1) * q / 100
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    result[has_data] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+    return result
+
+def run_job_query(group_by: List[str], aggregates: List[str], filters: Dict[str, Any]) -> Dict:
+    """Vectorized filter + group-by + aggregate over the cached job frame"""
+    for dimension in group_by:
+        if dimension not in QUERY_DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}', expected one of {QUERY_DIMENSIONS}")
+    parsed = [(spec, *parse_aggregate(spec)) for spec in aggregates]
+
+    frame = get_job_frame()
+    mask = np.ones(frame["job_id"].size, dtype=bool)
+    for column in ("user", "backend", "status", "program_id"):
+        if filters.get(column):
+            mask &= frame[column] == filters[column]
+    if filters.get("tag"):
+        mask &= np.isin(frame["job_id"], list(job_index.by_tag.get(filters["tag"], ())))
+    if filters.get("created_after"):
+        mask &= frame["created_ts"] >= filters["created_after"].timestamp()
+    if filters.get("created_before"):
+        mask &= frame["created_ts"] < filters["created_before"].timestamp()
+    rows = np.flatnonzero(mask)
+
+    if "tag" in group_by:
+        # A job with several tags counts once in each of its tag groups
+        tag_counts = np.array([len(frame["tags"][i]) for i in rows], dtype=np.int64)
+        tag_column = np.array([tag for i in rows for tag in frame["tags"][i]], dtype=object)
+        rows = np.repeat(rows, tag_counts)
+    columns = {d: (tag_column if d == "tag" else frame[d][rows]) for d in group_by}
+
+    if group_by:
+        codes, labels = [], []
+        for dimension in group_by:
+            uniques, inverse = np.unique(columns[dimension].astype(str), return_inverse=True)
+            labels.append(uniques)
+            codes.append(inverse)
+        keys = np.ravel_multi_index(codes, [len(l) for l in labels]) if rows.size else np.array([], dtype=np.int64)
+        group_keys, group_ids = np.unique(keys, return_inverse=True)
+        group_labels = np.unravel_index(group_keys, [len(l) for l in labels]) if rows.size else [[] for _ in labels]
+    else:
+        group_keys = np.zeros(1 if rows.size else 0, dtype=np.int64)
+        group_ids = np.zeros(rows.size, dtype=np.int64)
+    n_groups = group_keys.size
+
+    results = {}
+    for spec, op, field in parsed:
+        if op == "count":
+            results[spec] = np.bincount(group_ids, minlength=n_groups).astype(np.float64)
+            continue
+        values = frame[field][rows]
+        valid = np.isfinite(values)
+        if op in ("sum", "mean"):
+            sums = np.bincount(group_ids[valid], weights=values[valid], minlength=n_groups)
+            if op == "sum":
+                results[spec] = sums
+            else:
+                counts = np.bincount(group_ids[valid], minlength=n_groups)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    results[spec] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        else:
+            q = {"min": 0.0, "max": 100.0}.get(op) if op in ("min", "max") else float(op[1:])
+            results[spec] = grouped_percentile(values, group_ids, n_groups, q)
+
+    groups = []
+    for g in range(n_groups):
+        row = {d: str(labels[i][group_labels[i][g]]) for i, d in enumerate(group_by)} if group_by else {}
+        for spec in results:
+            value = results[spec][g]
+            row[spec] = None if np.isnan(value) else (int(value) if spec == "count" else float(value))
+        groups.append(row)
+
+    return {"rows_scanned": int(mask.sum()), "groups": groups}
+
+# ---------------------------
+# Job Ingestion
+# ---------------------------
+
+# Terminal jobs that are only kept as rollups, so listing them again costs no runtime calls
+ROLLED_UP_JOB_CACHE_SIZE = 5000
+_rolled_up_jobs: "OrderedDict[str, Dict]" = OrderedDict()
+_rolled_up_lock = threading.Lock()
+
+def remember_rolled_up_job(job_data: Dict) -> None:
+    if job_data.get("status") not in TERMINAL_STATUSES:
+        return
+    with _rolled_up_lock:
+        _rolled_up_jobs[job_data["job_id"]] = job_data
+        _rolled_up_jobs.move_to_end(job_data["job_id"])
+        while len(_rolled_up_jobs) > ROLLED_UP_JOB_CACHE_SIZE:
+            _rolled_up_jobs.popitem(last=False)
+
+def ingest_job(user: Dict, job) -> Dict:
+    """Extract job data and keep the server-side indexes current with it.
+
+    Jobs already indexed (or rolled up) in a terminal state never change, so
+    their stored record is returned without any runtime calls.
+    """
+    job_id = safe_get_attr(job, "job_id")
+    previous = job_index.jobs.get(job_id)
+    if previous is not None and previous["job"].get("status") in TERMINAL_STATUSES:
+        return dict(previous["job"])
+    with _rolled_up_lock:
+        if job_id in _rolled_up_jobs:
+            _rolled_up_jobs.move_to_end(job_id)
+            return dict(_rolled_up_jobs[job_id])
+
+    with trace_span("extract_job", job_id=job_id):
+        job_data = extract_job_data(job)
+    return record_job_data(user, job_data)
+
+def record_job_data(user: Dict, job_data: Dict) -> Dict:
+    """Add one job's extracted data to the failure index, search index, change log and sketches"""
+    job_id = job_data.get("job_id")
+    if job_rollups.covers(user["name"], job_data.get("creation_date")):
+        # Already counted in the daily rollups; raw records are not kept past the retention window
+        remember_rolled_up_job(job_data)
+        return job_data
+    if job_id not in (None, "Error", "Unknown"):
+        previous = job_index.jobs.get(job_id)
+        record_failure(user["name"], job_data)
+        job_index.upsert(user["name"], job_data)
+        if previous is None or previous["job"] != job_data:
+            change_log.record(user["name"], job_id)
+        # Sketch each job once, when it is first seen in a terminal state
+        if job_data.get("status") in TERMINAL_STATUSES and (
+                previous is None or previous["job"].get("status") not in TERMINAL_STATUSES):
+            record_job_latencies(user["name"], job_data)
+    return job_data
+
+# ---------------------------
+# Job Rollups
+# ---------------------------
+
+# Usage fields summarized per rollup row
+ROLLUP_METRICS = ["seconds", "quantum_seconds"]
+
+class JobRollups:
+    """Daily per-user, per-backend, per-status job summaries, one JSON file per month.
+
+    Each row keeps the job count and, for jobs with usage, a QuantileSketch per
+    usage field (which also carries the sum). For every user, jobs created
+    before that user's boundary are represented only here; the job index holds
+    the raw records from the boundary on.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        state = load_json(os.path.join(root, "state.json"), {"boundaries": {}})
+        self.boundaries: Dict[str, datetime] = {
+            user_name: parse_job_datetime(value) for user_name, value in state["boundaries"].items()
+        }
+        # month -> (day, user, backend, status) -> {"count": int, "sketches": {metric: QuantileSketch}}
+        self.rows: Dict[str, Dict[tuple, Dict]] = {}
+        if os.path.isdir(root):
+            for name in sorted(os.listdir(root)):
+                if re.fullmatch(r"\d{4}-\d{2}\.json", name):
+                    self.rows[name[:7]] = self._load_month(os.path.join(root, name))
+
+    def _load_month(self, path: str) -> Dict[tuple, Dict]:
+        rows = {}
+        for day, user_name, backend, status, count, sketches in load_json(path, {"rows": []})["rows"]:
+            rows[(day, user_name, backend, status)] = {
+                "count": count,
+                "sketches": {metric: QuantileSketch.from_dict(data) for metric, data in sketches.items()}
+            }
+        return rows
+
+    def _save(self, months: Dict[str, Dict[tuple, Dict]]) -> None:
+        """Write the given month rows, then the boundaries"""
+        os.makedirs(self.root, exist_ok=True)
+        for month, month_rows in months.items():
+            rows = [[*key, row["count"], {metric: sketch.to_dict() for metric, sketch in row["sketches"].items()}]
+                    for key, row in sorted(month_rows.items())]
+            save_json_atomic(os.path.join(self.root, f"{month}.json"), {"rows": rows})
+        save_json_atomic(os.path.join(self.root, "state.json"),
+                         {"boundaries": {u: b.isoformat() for u, b in self.boundaries.items() if b}})
+
+    def boundary(self, user_name: str) -> Optional[datetime]:
+        return self.boundaries.get(user_name)
+
+    def covers(self, user_name: str, creation_date) -> bool:
+        """Whether a job with this creation date belongs to the rolled-up tier"""
+        boundary = self.boundaries.get(user_name)
+        if boundary is None:
+            return False
+        created = parse_job_datetime(creation_date)
+        return created is not None and created < boundary
+
+    def add(self, user_name: str, jobs: List[Dict], boundary: datetime,
+            pending: Optional[Callable[[], List[Dict]]] = None) -> int:
+        """Fold jobs into their daily rows and move the user's boundary in one locked step.
+
+        The boundary moves first, so record_job_data stops adding older jobs to
+        the raw tier, and `pending()` then supplies the raw records to fold in
+        as well. The touched months are merged into copies and written before
+        the in-memory rows change; on any failure the boundary is restored.
+        """
+        with self._lock:
+            previous = self.boundaries.get(user_name)
+            self.boundaries[user_name] = boundary
+            try:
+                months: Dict[str, Dict[tuple, Dict]] = {}
+                added = 0
+                for job in list(jobs) + (pending() if pending else []):
+                    created = parse_job_datetime(job.get("creation_date"))
+                    if created is None:
+                        continue
+                    day = created.astimezone(timezone.utc).strftime('%Y-%m-%d')
+                    if day[:7] not in months:
+                        months[day[:7]] = copy.deepcopy(self.rows.get(day[:7], {}))
+                    key = (day, user_name, str(job.get("backend")), str(job.get("status")))
+                    row = months[day[:7]].setdefault(key, {"count": 0, "sketches": {}})
+                    row["count"] += 1
+                    usage = job.get("usage") or {}
+                    for metric in ROLLUP_METRICS:
+                        if usage.get(metric) is not None:
+                            row["sketches"].setdefault(metric, QuantileSketch()).add(usage[metric])
+                    added += 1
+                self._save(months)
+            except Exception:
+                if previous is None:
+                    self.boundaries.pop(user_name, None)
+                else:
+                    self.boundaries[user_name] = previous
+                raise
+            self.rows.update(months)
+        return added
+
+    def query(self, user_name: str, since: Optional[datetime] = None) -> List[tuple]:
+        """(day, backend, status, row) for a user's rows from the day of `since` on.
+
+        Rows cannot be split, so the whole day of `since` is included; callers
+        snap their cutoff with start_of_day to report the period they cover.
+        """
+        since_day = since.astimezone(timezone.utc).strftime('%Y-%m-%d') if since else ""
+        with self._lock:
+            return [
+                (day, backend, status, row)
+                for month, rows in self.rows.items() if month >= since_day[:7]
+                for (day, row_user, backend, status), row in rows.items()
+                if row_user == user_name and day >= since_day
+            ]
+
+def start_of_day(moment: datetime) -> datetime:
+    """Midnight UTC of the day a time falls on, the granularity of the rollup rows"""
+    return moment.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+job_rollups = JobRollups(os.path.join(DATA_DIR, "job_rollups"))
+_compact_lock = threading.Lock()
+
+def compact_user_jobs(user: Dict, now: Optional[datetime] = None) -> int:
+    """Move a user's jobs older than the raw window into the rollups and drop their raw records.
+
+    Jobs of the newly closed window that were never ingested are listed from
+    the runtime service first (back to JOB_ROLLUP_BACKFILL_DAYS on the first
+    run), so the rollups stay complete. Listing and extraction happen before
+    anything moves; JobRollups.add then moves the boundary and saves the rows
+    in one locked step, and only after that are the raw records dropped.
+    """
+    now = now or datetime.now(timezone.utc)
+    boundary = now - timedelta(days=JOB_RAW_RETENTION_DAYS)
+    previous = job_rollups.boundary(user["name"])
+    if previous is not None and boundary <= previous:
+        return 0
+
+    since = previous or now - timedelta(days=JOB_ROLLUP_BACKFILL_DAYS)
+    listed = {}
+    if boundary > since:
+        for job in list_jobs(get_service(user), limit=None, created_after=since, created_before=boundary):
+            created = parse_job_datetime(safe_get_attr(job, "creation_date"))
+            if created is not None and since <= created < boundary:
+                listed[safe_get_attr(job, "job_id")] = job
+
+    # Extract everything before the rollups or the job index change, so a failure here moves nothing
+    jobs = {}
+    for job_id, job in listed.items():
+        record = job_index.jobs.get(job_id)
+        if record is not None:
+            jobs[job_id] = record["job"]
+            continue
+        with trace_span("extract_job", job_id=job_id):
+            jobs[job_id] = extract_job_data(job)
+
+    def pending() -> List[Dict]:
+        # Raw records the listing missed (local jobs, or ones ingested meanwhile); those from before
+        # the previous boundary were re-added by a racing ingest and are already counted
+        return [job for job in job_index.created_before(user["name"], boundary)
+                if job["job_id"] not in jobs
+                and (previous is None or parse_job_datetime(job.get("creation_date")) >= previous)]
+
+    added = job_rollups.add(user["name"], list(jobs.values()), boundary, pending)
+    raw = job_index.remove_created_before(user["name"], boundary)
+    change_log.forget(user["name"], [job["job_id"] for job in raw])
+    for job in list(jobs.values()) + raw:
+        remember_rolled_up_job(job)
+    return added
+
+def compact_jobs() -> int:
+    """One compaction pass over every user; returns how many jobs were rolled up"""
+    if JOB_RAW_RETENTION_DAYS <= 0:
+        return 0
+    compacted = 0
+    with _compact_lock:
+        for user in USERS:
+            try:
+                compacted += compact_user_jobs(user)
+            except Exception as e:
+                print(f"Job compaction failed for {user['name']}: {e}")
+    return compacted
+
+def job_compactor_loop():
+    while not _collector_stop.is_set():
+        compact_jobs()
+        _collector_stop.wait(JOB_COMPACT_INTERVAL)
+
+# ---------------------------
+# Response Serialization
+# ---------------------------
+
+def _json_fallback(value):
+    """Values pydantic-core has no encoder for (numpy scalars and arrays, anything else as str)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+def encode_json(value) -> bytes:
+    """Compact UTF-8 JSON straight from pydantic-core; NaN and infinities become null"""
+    return pydantic_core.to_json(value, fallback=_json_fallback, inf_nan_mode="null")
+
+def has_large_section(value, depth: int = 0) -> bool:
+    """Whether value, or a dict nested up to three levels in it, holds a list/dict over RESPONSE_CHUNK_ITEMS"""
+    if isinstance(value, (list, tuple, dict)) and len(value) > RESPONSE_CHUNK_ITEMS:
+        return True
+    return isinstance(value, dict) and depth < 3 and any(has_large_section(v, depth + 1) for v in value.values())
+
+def iter_json(value, depth: int = 0) -> Iterator[bytes]:
+    """JSON for value in pieces, encoding large lists and dicts RESPONSE_CHUNK_ITEMS entries at a time"""
+    if isinstance(value, (list, tuple)) and len(value) > RESPONSE_CHUNK_ITEMS:
+        yield b"["
+        for start in range(0, len(value), RESPONSE_CHUNK_ITEMS):
+            yield (b"," if start else b"") + encode_json(value[start:start + RESPONSE_CHUNK_ITEMS])[1:-1]
+        yield b"]"
+    elif isinstance(value, dict) and len(value) > RESPONSE_CHUNK_ITEMS:
+        items = list(value.items())
+        yield b"{"
+        for start in range(0, len(items), RESPONSE_CHUNK_ITEMS):
+            yield (b"," if start else b"") + encode_json(dict(items[start:start + RESPONSE_CHUNK_ITEMS]))[1:-1]
+        yield b"}"
+    elif isinstance(value, dict) and depth < 3 and has_large_section(value, depth):
+        yield b"{"
+        for index, (key, item) in enumerate(value.items()):
+            yield (b"," if index else b"") + encode_json(str(key)) + b":"
+            yield from iter_json(item, depth + 1)
+        yield b"}"
+    else:
+        yield encode_json(value)
+
+def render_json(content, status_code: int = 200) -> Response:
+    """Response for a handler's return value, streamed when it has large list sections.
+
+    A streamed body is encoded while it is sent, so that work is traced as its
+    own "serialize_stream" span.
+    """
+    if has_large_section(content):
+        return StreamingResponse(trace_iter("serialize_stream", iter_json(content)),
+                                 status_code=status_code, media_type="application/json")
+    return Response(encode_json(content), status_code=status_code, media_type="application/json")
+
+# ---------------------------
+# Request Profiling
+# ---------------------------
+
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+PROFILE_SAMPLE_INTERVAL = 0.001
+PROFILE_TOP_ALLOCATIONS = 50
+
+class ProfileSession:
+    """Samples the stacks of the threads serving one request and records its allocations.
+
+    Stacks are folded into the collapsed format read by flamegraph.pl and speedscope.
+    The event-loop thread is sampled too, so JSON encoding and middleware show up
+    alongside the endpoint body (and so can other coroutines running at the time).
+    """
+
+    def __init__(self, request: Request):
+        self.profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.method = request.method
+        self.path = request.url.path
+        self.query = request.url.query
+        self.thread_ids = set()
+        self.stacks = Counter()
+        self.samples = 0
+        self._active = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._started_tracemalloc = False
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracemalloc = True
+        self.started_at = time.perf_counter()
+        self._active.set()
+        self._sampler.start()
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        while self._active.is_set():
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(PROFILE_SAMPLE_INTERVAL)
+
+    def stop(self, status_code: int) -> Dict:
+        self.duration = time.perf_counter() - self.started_at
+        self._active.clear()
+        self._sampler.join()
+        snapshot = tracemalloc.take_snapshot()
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, self.profile_id)
+        with open(f"{base}.folded", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        snapshot.dump(f"{base}.tracemalloc")
+        top_allocations = [
+            {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+        ]
+        summary = {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status_code": status_code,
+            "duration_seconds": self.duration,
+            "samples": self.samples,
+            "traced_memory_bytes": {"current": traced_current, "peak": traced_peak},
+            "top_allocations": top_allocations,
+            "created": datetime.now().isoformat()
+        }
+        save_json_atomic(f"{base}.json", summary)
+        prune_profiles()
+        return summary
+
+def prune_profiles() -> None:
+    """Keep only the PROFILE_MAX_STORED most recent profiles on disk"""
+    try:
+        summaries = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith(".json"))
+    except OSError:
+        return
+    for name in summaries[:-PROFILE_MAX_STORED]:
+        profile_id = name[:-len(".json")]
+        for suffix in (".json", ".folded", ".tracemalloc"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except OSError:
+                pass
+
+_profile_session: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+# One profiled request at a time keeps samples and allocation snapshots attributable
+_profile_lock = threading.Lock()
+
+def profiling_requested(request: Request) -> bool:
+    if not PROFILE_ADMIN_TOKEN:
+        return False
+    token = request.headers.get("x-profile-token") or request.query_params.get("profile_token")
+    return token == PROFILE_ADMIN_TOKEN
+
+class ProfilingRoute(APIRoute):
+    """APIRoute that adds the worker thread running a sync endpoint to an active profile.
+
+    It also traces the endpoint body and serializes plain return values itself
+    with render_json(), in a separate "serialize" span. The response model is
+    then only used for the OpenAPI schema (and VALIDATE_RESPONSES checks), so
+    FastAPI's jsonable_encoder pass is skipped. Requests are admitted through
+    the route's AdmissionLimiters before anything else runs, and hold their
+    slots until a streamed body has been sent.
+    """
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        adapter = TypeAdapter(self.response_model) if VALIDATE_RESPONSES and self.response_model else None
+
+        def render(content):
+            if isinstance(content, Response):
+                return content
+            with trace_span("serialize"):
+                if adapter is not None:
+                    adapter.validate_python(content)
+                return render_json(content, self.status_code or 200)
+
+        if asyncio.iscoroutinefunction(call):
+            # Async endpoints run on the event-loop thread, which the session already samples
+            @functools.wraps(call)
+            async def traced_call(*args, **kwargs):
+                with trace_span("endpoint"):
+                    content = await call(*args, **kwargs)
+                return render(content)
+            self.dependant.call = traced_call
+        else:
+            @functools.wraps(call)
+            def profiled_call(*args, **kwargs):
+                session = _profile_session.get()
+                thread_id = threading.get_ident()
+                if session is not None:
+                    session.thread_ids.add(thread_id)
+                try:
+                    with trace_span("endpoint"):
+                        content = call(*args, **kwargs)
+                    return render(content)
+                finally:
+                    if session is not None:
+                        session.thread_ids.discard(thread_id)
+            self.dependant.call = profiled_call
+
+        handler = super().get_route_handler()
+        limiters = admission_limiters(self.path_format)
+        if not limiters:
+            return handler
+
+        async def admitted_handler(request: Request):
+            acquired = await admit(limiters)
+            start = time.perf_counter()
+
+            def release():
+                elapsed = time.perf_counter() - start
+                for limiter in reversed(acquired):
+                    limiter.release(elapsed)
+
+            try:
+                response = await handler(request)
+            except BaseException:
+                release()
+                raise
+            if not isinstance(response, StreamingResponse):
+                release()
+                return response
+
+            # A streamed body is encoded while it is sent, so the slots are held until sending ends
+            async def send_then_release(scope, receive, send):
+                try:
+                    await response(scope, receive, send)
+                finally:
+                    release()
+            return send_then_release
+        return admitted_handler
+
+# Must be set before any route is declared
+app.router.route_class = ProfilingRoute
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if request.url.path.startswith("/debug/") or not profiling_requested(request):
+        return await call_next(request)
+    if not _profile_lock.acquire(blocking=False):
+        response = await call_next(request)
+        response.headers["X-Profile-Status"] = "busy"
+        return response
+
+    try:
+        session = ProfileSession(request)
+        session.thread_ids.add(threading.get_ident())
+        token = _profile_session.set(session)
+        session.start()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            _profile_session.reset(token)
+            summary = session.stop(status_code)
+        response.headers["X-Profile-Id"] = summary["profile_id"]
+        return response
+    finally:
+        _profile_lock.release()
+
+@app.middleware("http")
+async def count_runtime_calls(request: Request, call_next):
+    """Report how many runtime service calls a request made, in total and by kind"""
+    calls = Counter()
+    token = _runtime_calls.set(calls)
+    try:
+        response = await call_next(request)
+    finally:
+        _runtime_calls.reset(token)
+    response.headers["X-Runtime-Calls"] = str(sum(calls.values()))
+    if calls:
+        response.headers["X-Runtime-Calls-Detail"] = ",".join(f"{kind}={n}" for kind, n in sorted(calls.items()))
+    return response
+
+# ---------------------------
+# Request Tracing
+# ---------------------------
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "1") != "0"
+TRACE_RECENT = 200
+TRACE_SLOWEST = 50
+# Spans beyond this are counted but not kept, so one huge fan-out cannot grow a trace unbounded
+TRACE_MAX_SPANS = 5000
+
+class RequestTrace:
+    """Spans recorded while serving one request, with offsets relative to its start"""
+
+    def __init__(self, request: Request):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.method = request.method
+        self.path = request.url.path
+        self.query = request.url.query
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.t0 = time.perf_counter()
+        self.duration = None
+        self.status_code = None
+        self.spans: List[Dict] = []
+        self.dropped = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def new_span_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def add(self, name: str, start: float, end: float, span_id: Optional[int] = None,
+            parent_id: Optional[int] = None, attrs: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        span = {
+            "id": span_id or self.new_span_id(),
+            "parent": parent_id,
+            "name": name,
+            "start_ms": round((start - self.t0) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+            "thread": threading.current_thread().name
+        }
+        if attrs:
+            span["attrs"] = attrs
+        if error:
+            span["error"] = error
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            spans = list(self.spans)
+        by_name = defaultdict(lambda: {"count": 0, "total_ms": 0.0})
+        for span in spans:
+            by_name[span["name"]]["count"] += 1
+            by_name[span["name"]]["total_ms"] += span["duration_ms"]
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "started_at": self.started_at,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "spans": len(spans) + self.dropped,
+            "by_span": {name: dict(count=v["count"], total_ms=round(v["total_ms"], 3))
+                        for name, v in sorted(by_name.items(), key=lambda kv: -kv[1]["total_ms"])}
+        }
+
+    def waterfall(self) -> List[Dict]:
+        """Spans in start order, each with its nesting depth"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda sp: (sp["start_ms"], sp["id"]))
+        depth = {}
+        ordered = []
+        for span in spans:
+            depth[span["id"]] = depth.get(span["parent"], -1) + 1 if span["parent"] else 0
+            ordered.append(dict(span, depth=depth[span["id"]]))
+        return ordered
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_trace_lock = threading.Lock()
+_recent_traces: deque = deque(maxlen=TRACE_RECENT)
+# Min-heap of (duration, seq, trace) holding the TRACE_SLOWEST slowest requests
+_slowest_traces: List[tuple] = []
+_trace_seq = 0
+
+@contextlib.contextmanager
+def trace_span(name: str, **attrs):
+    """Record a span in the current request's trace; a no-op outside traced requests"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = trace.new_span_id()
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.add(name, start, time.perf_counter(), span_id=span_id, parent_id=parent_id,
+                  attrs=attrs or None, error=error)
+
+def trace_iter(name: str, iterator: Iterator) -> Iterator:
+    """Wrap an iterator so the time spent producing its items is recorded as one span.
+
+    The span starts at the first item and lasts as long as the producing took
+    (not the waits in between); attrs carry the item count and the wall time.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return iterator
+    parent_id = _current_span.get()
+
+    def timed():
+        first = None
+        busy = 0.0
+        items = 0
+        error = None
+        try:
+            while True:
+                start = time.perf_counter()
+                first = first or start
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    busy += time.perf_counter() - start
+                items += 1
+                yield item
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            if first is not None:
+                trace.add(name, first, first + busy, parent_id=parent_id, error=error,
+                          attrs={"items": items, "wall_ms": round((time.perf_counter() - first) * 1000, 3)})
+    return timed()
+
+def store_trace(trace: RequestTrace) -> None:
+    global _trace_seq
+    with _trace_lock:
+        _trace_seq += 1
+        _recent_traces.append(trace)
+        entry = (trace.duration, _trace_seq, trace)
+        if len(_slowest_traces) < TRACE_SLOWEST:
+            heapq.heappush(_slowest_traces, entry)
+        elif trace.duration > _slowest_traces[0][0]:
+            heapq.heapreplace(_slowest_traces, entry)
+
+def find_trace(trace_id: str) -> Optional[RequestTrace]:
+    with _trace_lock:
+        for trace in list(_recent_traces) + [entry[2] for entry in _slowest_traces]:
+            if trace.trace_id == trace_id:
+                return trace
+    return None
+
+def render_waterfall(trace: RequestTrace, width: int = 60) -> str:
+    """Plain-text waterfall: one bar per span, scaled to the request duration"""
+    total_ms = max((trace.duration or 0) * 1000, 1e-6)
+    lines = [f"{trace.method} {trace.path}{'?' + trace.query if trace.query else ''}  "
+             f"{trace.status_code}  {total_ms:.1f} ms  trace {trace.trace_id}", ""]
+    for span in trace.waterfall():
+        begin = int(span["start_ms"] / total_ms * width)
+        length = max(1, int(span["duration_ms"] / total_ms * width))
+        bar = " " * min(begin, width - 1) + "#" * min(length, width - min(begin, width - 1))
+        label = "  " * span["depth"] + span["name"] + ("!" if "error" in span else "")
+        lines.append(f"{span['start_ms']:10.1f} {span['duration_ms']:10.1f}  {label:<36.36} |{bar:<{width}}|")
+    if trace.dropped:
+        lines.append(f"... {trace.dropped} more spans not kept")
+    return "\n".join(lines) + "\n"
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    if not TRACING_ENABLED or request.url.path.startswith("/debug/"):
+        return await call_next(request)
+    trace = RequestTrace(request)
+    token = _current_trace.set(trace)
+    trace.status_code = 500
+    try:
+        response = await call_next(request)
+        trace.status_code = response.status_code
+    finally:
+        _current_trace.reset(token)
+        trace.duration = time.perf_counter() - trace.t0
+        store_trace(trace)
+    response.headers["X-Trace-Id"] = trace.trace_id
+    return response
+
+# ---------------------------
+# Admission Control
+# ---------------------------
+
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "1") != "0"
+# Route class -> (concurrent requests, queued requests, max seconds queued). Sync endpoints run
+# on the 40-thread default pool, so the classes together stay below that and a burst in one
+# class can never take the threads another class needs.
+ADMISSION_CLASSES = {
+    "health": (4, 16, 0.5),
+    "jobs": (12, 24, 2.0),
+    "analytics": (10, 10, 2.0),
+    "default": (8, 8, 2.0)
+}
+# Tighter caps for routes that fan out over every user or hundreds of jobs (inside their class)
+ROUTE_CONCURRENCY = {
+    "/analytics/trends/{user_name}": 3,
+    "/analytics/all-users": 1,
+    "/analytics/failures/{user_name}": 3,
+    "/recommendations/estimate": 2
+}
+# Path prefix -> route class; /debug/ stays unlimited so overload can still be inspected
+ADMISSION_PREFIXES = [
+    ("/debug/", None),
+    ("/jobs/", "jobs"),
+    ("/results/", "jobs"),
+    ("/analytics/", "analytics"),
+    ("/recommendations/", "analytics"),
+    ("/backends/", "analytics")
+]
+
+class AdmissionLimiter:
+    """Concurrency limit with a short bounded FIFO queue, used from the event loop only"""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Moving average of how long an admitted request holds its slot
+        self.avg_seconds = 0.0
+        self._waiters: deque = deque()
+
+    async def acquire(self) -> bool:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self, seconds: Optional[float] = None) -> None:
+        if seconds is not None:
+            self.avg_seconds = seconds if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * seconds
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot goes straight to the oldest waiter, so active is unchanged
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: one average hold per queued round, capped at a minute"""
+        rounds = 1 + len(self._waiters) / self.max_concurrent
+        return max(1, min(60, math.ceil(self.avg_seconds * rounds)))
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_ms": round(self.avg_seconds * 1000, 3)
+        }
+
+_class_limiters = {name: AdmissionLimiter(name, *limits) for name, limits in ADMISSION_CLASSES.items()}
+_route_limiters: Dict[str, AdmissionLimiter] = {}
+
+def admission_class(path: str) -> Optional[str]:
+    if path in ("/", "/health", "/users"):
+        return "health"
+    for prefix, name in ADMISSION_PREFIXES:
+        if path.startswith(prefix):
+            return name
+    return "default"
+
+def admission_limiters(path: str) -> List[AdmissionLimiter]:
+    """Limiters a route must pass, its own cap first and then its class"""
+    class_name = admission_class(path)
+    if not ADMISSION_CONTROL or class_name is None:
+        return []
+    limiters = []
+    if path in ROUTE_CONCURRENCY:
+        _, max_queue, max_wait = ADMISSION_CLASSES[class_name]
+        limiter = _route_limiters.setdefault(path, AdmissionLimiter(path, ROUTE_CONCURRENCY[path], max_queue, max_wait))
+        limiters.append(limiter)
+    limiters.append(_class_limiters[class_name])
+    return limiters
+
+async def admit(limiters: List[AdmissionLimiter]) -> List[AdmissionLimiter]:
+    """Acquire every limiter or none; raises a 503 with Retry-After when one is saturated"""
+    acquired = []
+    with trace_span("admission"):
+        for limiter in limiters:
+            if not await limiter.acquire():
+                for held in reversed(acquired):
+                    held.release()
+                raise HTTPException(status_code=503, detail=f"Server busy ({limiter.name}), retry later",
+                                    headers={"Retry-After": str(limiter.retry_after())})
+            acquired.append(limiter)
+    return acquired
+
+# ---------------------------
+# Response Models
+# ---------------------------
+# Handlers return plain dicts that ProfilingRoute encodes directly; these models
+# describe them for the OpenAPI schema and for VALIDATE_RESPONSES. Extra keys are
+# allowed because several sections only add a field when it applies.
+
+class ResponseModel(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+class NamedCount(ResponseModel):
+    name: str
+    job_count: int
+
+class PercentileSummary(ResponseModel):
+    count: int
+    mean: float
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+    max: Optional[float] = None
+
+class JobRecord(ResponseModel):
+    job_id: str
+    status: str
+    backend: str
+    creation_date: Optional[str] = None
+    program_id: Optional[str] = None
+    tags: List[str] = []
+    usage: Dict[str, Optional[float]] = {}
+    metrics: Dict[str, Any] = {}
+    queue_info: Dict[str, Any] = {}
+    error_message: Optional[str] = None
+    # Set instead of the fields above when extraction failed
+    error: Optional[str] = None
+
+class HomeResponse(ResponseModel):
+    message: str
+    version: str
+
+class JobSearchFilters(ResponseModel):
+    user: Optional[str] = None
+    tags: List[str] = []
+    program_id: Optional[str] = None
+    backend: Optional[str] = None
+    status: Optional[str] = None
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+
+class JobSearchResponse(ResponseModel):
+    filters: JobSearchFilters
+    indexed_jobs: int
+    total_matches: int
+    jobs: List[JobRecord]
+
+class JobListResponse(ResponseModel):
+    user: str
+    total_jobs: int
+    jobs: List[JobRecord]
+
+class JobStatusResponse(ResponseModel):
+    user: str
+    analysis_period_days: int
+    total_jobs: int
+    status_distribution: Dict[str, int]
+    success_rate: float
+    average_execution_time: float
+    execution_time_percentiles: PercentileSummary
+    queue_wait_percentiles: PercentileSummary
+
+class BackendReliability(ResponseModel):
+    total: int
+    failed: int
+    reliability_percent: float
+
+class JobError(ResponseModel):
+    job_id: str
+    error: str
+    error_template: str
+    backend: str
+
+class ErrorAnalysis(ResponseModel):
+    total_jobs: int
+    failed_jobs: int
+    error_types: Dict[str, int]
+    backend_reliability: Dict[str, BackendReliability]
+    common_errors: List[JobError]
+    overall_error_rate: float
+
+class ErrorAnalysisResponse(ResponseModel):
+    user: str
+    error_analysis: ErrorAnalysis
+
+class CircuitSummary(ResponseModel):
+    circuits: int
+    max_width: int = 0
+    max_depth: int = 0
+    total_two_qubit_gates: int = 0
+    gate_histogram: Dict[str, int] = {}
+
+class JobResources(ResponseModel):
+    job_id: str
+    backend: str
+    quantum_seconds: Optional[float] = None
+    execution_seconds: Optional[float] = None
+    status: str
+    circuits: Optional[CircuitSummary] = None
+
+class CircuitCorrelation(ResponseModel):
+    jobs_with_circuits: int
+    quantum_seconds_vs_depth: Optional[float] = None
+    quantum_seconds_vs_width: Optional[float] = None
+    quantum_seconds_vs_two_qubit_gates: Optional[float] = None
+
+class ResourceAnalysis(ResponseModel):
+    total_quantum_seconds: float
+    total_execution_time: float
+    jobs_analyzed: int
+    resource_distribution: List[JobResources]
+    average_resources: Dict[str, float]
+    circuit_correlation: Optional[CircuitCorrelation] = None
+    # Only with ?days=: jobs counted from the daily rollups and period-wide percentiles
+    period_days: Optional[int] = None
+    period_start: Optional[str] = None
+    rolled_up_jobs: Optional[int] = None
+    percentiles: Optional[Dict[str, PercentileSummary]] = None
+
+class ResourceResponse(ResponseModel):
+    user: str
+    resource_analysis: ResourceAnalysis
+
+class BackendInfo(ResponseModel):
+    name: Optional[str] = None
+    operational: Optional[bool] = None
+    status_msg: Optional[str] = None
+    pending_jobs: Optional[int] = None
+    last_update: Optional[str] = None
+    n_qubits: Optional[int] = None
+    properties_available: Optional[bool] = None
+    max_shots: Optional[int] = None
+    coupling_map: Optional[int] = None
+    config_available: Optional[bool] = None
+    error: Optional[str] = None
+
+class BackendPerformanceResponse(ResponseModel):
+    total_backends: int
+    backend_analysis: Dict[str, BackendInfo]
+    timestamp: str
+
+class TrendSources(ResponseModel):
+    raw_jobs: int
+    rolled_up_jobs: int
+    # Jobs created before this are counted from the daily rollups
+    raw_window_start: Optional[str] = None
+    # Start of the period actually counted, midnight UTC of the cutoff day when rollups are used
+    period_start: Optional[str] = None
+
+class TrendsAnalysis(ResponseModel):
+    period_days: int
+    daily_job_counts: Dict[str, int]
+    backend_usage_over_time: Dict[str, Dict[str, int]]
+    status_trends: Dict[str, Dict[str, int]]
+    # "" when there are no jobs, otherwise [day, count] / [backend, count]
+    peak_usage_day: Union[Tuple[str, int], str]
+    most_used_backend: Union[Tuple[str, int], str]
+    sources: TrendSources
+
+class TrendsResponse(ResponseModel):
+    user: str
+    trends_analysis: TrendsAnalysis
+
+class RecentJob(ResponseModel):
+    job_id: str
+    status: str
+    backend: str
+    date: Optional[str] = None
+
+class UserActivity(ResponseModel):
+    total_jobs: int = 0
+    status_distribution: Dict[str, int] = {}
+    backend_usage: Dict[str, int] = {}
+    recent_activity: List[RecentJob] = []
+    success_rate: float = 0
+    error: Optional[str] = None
+
+class AllUsersSummary(ResponseModel):
+    most_active_user: Union[NamedCount, str]
+    total_jobs_all_users: int
+    average_jobs_per_user: float
+
+class AllUsersResponse(ResponseModel):
+    total_users: int
+    user_activity: Dict[str, UserActivity]
+    summary: AllUsersSummary
+
+class BackendUsageStats(ResponseModel):
+    job_count: int
+    success_count: int
+    total_quantum_seconds: float
+    avg_execution_time: float
+    success_rate: Optional[float] = None
+    execution_time_percentiles: Optional[PercentileSummary] = None
+    quantum_seconds_percentiles: Optional[PercentileSummary] = None
+
+class UsageSummary(ResponseModel):
+    total_backends_used: int
+    most_used_backend: Union[NamedCount, str]
+    least_used_backend: Union[NamedCount, str]
+    recommendation: str
+
+class BackendMonitor(ResponseModel):
+    backend_usage_stats: Dict[str, BackendUsageStats]
+    usage_summary: UsageSummary
+
+class BackendUsageResponse(ResponseModel):
+    user: str
+    backend_monitor: BackendMonitor
+
+class FailedJob(ResponseModel):
+    job_id: str
+    backend: str
+    status: str
+    error_message: Optional[str] = None
+    creation_date: Optional[str] = None
+
+class DepthBucket(ResponseModel):
+    total: int
+    failed: int
+    failure_rate: float
+
+class FailurePatterns(ResponseModel):
+    by_backend: Dict[str, int]
+    by_error_type: Dict[str, int]
+    by_time_pattern: Dict[str, int]
+    by_circuit_depth: Optional[Dict[str, DepthBucket]] = None
+
+class FailureReason(ResponseModel):
+    fingerprint: str
+    template: str
+    count: int
+    example_job_ids: List[str]
+
+class UnreliableBackend(ResponseModel):
+    name: str
+    failure_count: int
+
+class FailureInsights(ResponseModel):
+    most_unreliable_backend: Union[UnreliableBackend, str]
+    common_failure_reasons: List[FailureReason]
+    failure_rate_trend: List[Any]
+
+class FailureAnalysis(ResponseModel):
+    total_jobs_analyzed: int
+    failed_jobs: List[FailedJob]
+    failure_patterns: FailurePatterns
+    failure_insights: FailureInsights
+    overall_failure_rate: float
+
+class FailureResponse(ResponseModel):
+    user: str
+    failure_analysis: FailureAnalysis
+
+class SuggestedLayout(ResponseModel):
+    qubits: List[int]
+    estimated_fidelity: float
+
+class BackendRecommendation(ResponseModel):
+    backend_name: str
+    operational: bool
+    pending_jobs: int
+    recommendation_score: int
+    status_message: str
+    recommendation: str
+    suggested_layout: Optional[SuggestedLayout] = None
+
+class SchedulerResponse(ResponseModel):
+    recommended_backends: List[BackendRecommendation]
+    analysis_timestamp: str
+    recommendation_criteria: Dict[str, str]
+    total_backends_analyzed: int
+    best_choice: Optional[BackendRecommendation] = None
+
+class FailureGroup(ResponseModel):
+    fingerprint: str
+    template: str
+    count: int
+    backends: Dict[str, int]
+    example_message: Optional[str] = None
+    example_job_ids: List[str]
+
+class ErrorFingerprintsResponse(ResponseModel):
+    user: Optional[str] = None
+    total_groups: int
+    groups: List[FailureGroup]
+    timestamp: str
+
+class RegisterCounts(ResponseModel):
+    shots: int
+    distinct_outcomes: int
+    histogram: Dict[str, int]
+
+class PubResult(ResponseModel):
+    pub_index: int
+    counts: Dict[str, RegisterCounts]
+    # Estimator expectation values and standard deviations, as nested lists
+    values: Dict[str, Any]
+
+class JobResultResponse(ResponseModel):
+    user: str
+    job_id: str
+    pubs: List[PubResult]
+
+class MergedCountsResponse(ResponseModel):
+    user: str
+    job_ids: List[str]
+    # "register" would shadow BaseModel.register
+    register_name: Optional[str] = Field(default=None, alias="register")
+    total_shots: int
+    distinct_outcomes: int
+    histogram: Dict[str, int]
+
+class CacheStatsResponse(ResponseModel):
+    cached_jobs: int
+    blobs: int
+    total_bytes: int
+    max_bytes: int
+
+class CircuitAnalysisResponse(ResponseModel):
+    user: str
+    jobs_analyzed: int
+    circuits_cached: int
+    jobs: Dict[str, CircuitSummary]
+
+class BackendEstimate(ResponseModel):
+    backend_name: str
+    calibration: Optional[str] = None
+    transpiled_depth: Optional[int] = None
+    transpiled_size: Optional[int] = None
+    two_qubit_gates: Optional[int] = None
+    circuit_duration_seconds: Optional[float] = None
+    success_probability: Optional[float] = None
+    cached: Optional[bool] = None
+    pending_jobs: Optional[int] = None
+    estimated_execution_seconds: Optional[float] = None
+    estimated_queue_seconds: Optional[float] = None
+    estimated_completion_seconds: Optional[float] = None
+    score: Optional[float] = None
+    error: Optional[str] = None
+
+class EstimateResponse(ResponseModel):
+    circuit: Dict[str, int]
+    shots: int
+    total_backends_analyzed: int
+    estimates: List[BackendEstimate]
+    best_choice: Optional[BackendEstimate] = None
+    analysis_timestamp: str
+
+class JobChangesResponse(ResponseModel):
+    user: str
+    reset: bool
+    cursor: str
+    has_more: bool
+    total_changed: int
+    jobs: List[JobRecord]
+
+class DistributionStats(ResponseModel):
+    count: int
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    # Qubit indices, or [q0, q1] pairs for two-qubit gate errors
+    outliers: List[Any] = []
+
+class EdgeError(ResponseModel):
+    qubits: List[int]
+    error: Optional[float] = None
+
+class CalibrationReport(ResponseModel):
+    last_update: Optional[str] = None
+    n_qubits: Optional[int] = None
+    n_edges: Optional[int] = None
+    t1_us: Optional[DistributionStats] = None
+    t2_us: Optional[DistributionStats] = None
+    readout_error: Optional[DistributionStats] = None
+    single_qubit_error: Optional[DistributionStats] = None
+    two_qubit_error: Optional[DistributionStats] = None
+    qubits: Optional[Dict[str, List[Optional[float]]]] = None
+    edges: Optional[List[EdgeError]] = None
+    error: Optional[str] = None
+
+class CalibrationResponse(ResponseModel):
+    total_backends: int
+    calibration: Dict[str, CalibrationReport]
+    timestamp: str
+
+class QubitLayout(ResponseModel):
+    backend_name: str
+    qubits: Optional[List[int]] = None
+    edges: Optional[List[List[int]]] = None
+    estimated_fidelity: Optional[float] = None
+    cost: Optional[float] = None
+    error: Optional[str] = None
+
+class BestQubitsResponse(ResponseModel):
+    width: int
+    total_backends: int
+    layouts: List[QubitLayout]
+    best_choice: Optional[QubitLayout] = None
+    timestamp: str
+
+class PercentilesResponse(ResponseModel):
+    user: Optional[str] = None
+    backend: Optional[str] = None
+    overall: Dict[str, PercentileSummary]
+    by_backend: Dict[str, Dict[str, PercentileSummary]]
+    relative_accuracy: float
+    timestamp: str
+
+class ProfilesResponse(ResponseModel):
+    total_profiles: int
+    max_stored: int
+    profiles: List[Dict[str, Any]]
+
+class Submission(ResponseModel):
+    submission_id: Optional[str] = None
+    user: str
+    backend: str
+    mode: str
+    shots: int
+    status: str
+    job_id: Optional[str] = None
+    pub_index: Optional[int] = None
+    error: Optional[str] = None
+    queued_at: Optional[str] = None
+    cached_result: Optional[bool] = None
+
+class SubmitResponse(ResponseModel):
+    mode: str
+    batch_window_seconds: float
+    total_submissions: int
+    submissions: List[Submission]
+
+class QueryResponse(ResponseModel):
+    group_by: List[str]
+    aggregates: List[str]
+    filters: Dict[str, Any]
+    rows_scanned: int
+    total_groups: int
+    # One row per group: the group_by keys plus one value per aggregate
+    groups: List[Dict[str, Any]]
+
+class WeeklyMedian(ResponseModel):
+    week: str
+    snapshots: int
+    median: float
+
+class MetricDrift(ResponseModel):
+    weekly: List[WeeklyMedian]
+    change_percent: Optional[float] = None
+    slope_per_week: Optional[float] = None
+
+class QubitDrift(ResponseModel):
+    qubit: int
+    change_percent: float
+
+class DriftPeriod(ResponseModel):
+    start: str
+    end: str
+    weeks: int
+
+class DriftResponse(ResponseModel):
+    backend: str
+    period: DriftPeriod
+    snapshots: int
+    metrics: Dict[str, MetricDrift]
+    most_degraded_qubits: Dict[str, List[QubitDrift]]
+    timestamp: str
+
+class SpanTotals(ResponseModel):
+    count: int
+    total_ms: float
+
+class TraceSummary(ResponseModel):
+    trace_id: str
+    method: str
+    path: str
+    query: str
+    started_at: str
+    status_code: Optional[int] = None
+    duration_ms: Optional[float] = None
+    spans: int
+    by_span: Dict[str, SpanTotals]
+
+class TracesResponse(ResponseModel):
+    order: str
+    tracing_enabled: bool
+    total_traces: int
+    traces: List[TraceSummary]
+
+class TraceSpan(ResponseModel):
+    id: int
+    parent: Optional[int] = None
+    name: str
+    start_ms: float
+    duration_ms: float
+    thread: str
+    depth: int
+    attrs: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class TraceDetail(TraceSummary):
+    waterfall: List[TraceSpan]
+    dropped_spans: int
+
+class UsersResponse(ResponseModel):
+    total_users: int
+    users: List[str]
+
+class AdmissionStats(ResponseModel):
+    max_concurrent: int
+    max_queue: int
+    active: int
+    queued: int
+    admitted: int
+    rejected: int
+    timed_out: int
+    avg_ms: float
+
+class HealthResponse(ResponseModel):
+    status: str
+    version: str
+    features_available: int
+    total_users: int
+    # Per route class and per capped route
+    admission: Dict[str, AdmissionStats]
+    timestamp: str
 
 # ---------------------------
 # 2. Health Check
 # ---------------------------
-@app.get("/")
+@app.get("/", response_model=HomeResponse)
 def home():
     return {"message": "Quantum Job Tracker Backend is Running 🚀", "version": "2.0"}
 
+# ---------------------------
+# Job Search (declared before /jobs/{user_name} so "search" is not taken as a user)
+# ---------------------------
+@app.get("/jobs/search", response_model=JobSearchResponse)
+def search_jobs(
+    user_name: Optional[str] = None,
+    tag: Optional[List[str]] = Query(default=None),
+    program_id: Optional[str] = None,
+    backend: Optional[str] = None,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    limit: int = Query(default=100, le=1000)
+):
+    """Search ingested jobs by user, tags, program, backend, status and creation window"""
+    if user_name:
+        user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_name = user["name"]
+
+    if created_after:
+        created_after = parse_job_datetime(created_after)
+    if created_before:
+        created_before = parse_job_datetime(created_before)
+
+    result = job_index.search(
+        user_name=user_name,
+        tags=tag,
+        program_id=program_id,
+        backend=backend,
+        status=status,
+        created_after=created_after,
+        created_before=created_before,
+        limit=limit
+    )
+    return {
+        "filters": {
+            "user": user_name,
+            "tags": tag or [],
+            "program_id": program_id,
+            "backend": backend,
+            "status": status,
+            "created_after": created_after.isoformat() if created_after else None,
+            "created_before": created_before.isoformat() if created_before else None
+        },
+        "indexed_jobs": len(job_index.jobs),
+        "total_matches": result["total_matches"],
+        "jobs": result["jobs"]
+    }
+
 # ---------------------------
 # 3. Feature 1: Job Tracker
 # ---------------------------
-@app.get("/jobs/{user_name}")
+@app.get("/jobs/{user_name}", response_model=JobListResponse)
 def get_jobs(user_name: str, limit: int = Query(default=10, le=100)):
     """Get jobs for a specific user - Feature 1: Job Tracker"""
     user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
@@ -174,8 +3575,13 @@ def get_jobs(user_name: str, limit: int = Query(default=10, le=100)):
 
     try:
         service = get_service(user)
-        jobs = service.jobs(limit=limit)
-        job_list = [extract_job_data(job) for job in jobs]
+        jobs = list_jobs(service, limit=limit)
+        job_list = [ingest_job(user, job) for job in jobs]
+        local_jobs = local_jobs_for(user["name"], limit)
+        if local_jobs:
+            oldest = datetime.min.replace(tzinfo=timezone.utc)
+            job_list = sorted(job_list + local_jobs, key=lambda j: parse_job_datetime(j.get("creation_date")) or oldest,
+                              reverse=True)[:limit]
         
         return {
             "user": user_name,
@@ -189,7 +3595,7 @@ def get_jobs(user_name: str, limit: int = Query(default=10, le=100)):
 # ---------------------------
 # 4. Feature 2: Job Status Analyzer
 # ---------------------------
-@app.get("/analytics/job-status/{user_name}")
+@app.get("/analytics/job-status/{user_name}", response_model=JobStatusResponse)
 def analyze_job_status(user_name: str, days: int = Query(default=30, le=365)):
     """Analyze job status distribution - Feature 2: Job Status Analyzer"""
     user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
@@ -199,22 +3605,24 @@ def analyze_job_status(user_name: str, days: int = Query(default=30, le=365)):
     try:
         service = get_service(user)
         cutoff_date = datetime.now() - timedelta(days=days)
-        jobs = service.jobs(limit=200, created_after=cutoff_date)
+        jobs = list_jobs(service, limit=200, created_after=cutoff_date)
         
         status_counts = Counter()
         total_jobs = 0
-        execution_times = []
+        execution_time_total = 0
+        execution_time_count = 0
         
         for job in jobs:
-            job_data = extract_job_data(job)
+            job_data = ingest_job(user, job)
             status_counts[job_data["status"]] += 1
             total_jobs += 1
             
             # Calculate execution time if available
             if job_data["usage"].get("seconds"):
-                execution_times.append(job_data["usage"]["seconds"])
+                execution_time_total += job_data["usage"]["seconds"]
+                execution_time_count += 1
         
-        avg_execution_time = sum(execution_times) / len(execution_times) if execution_times else 0
+        avg_execution_time = execution_time_total / execution_time_count if execution_time_count else 0
         
         return {
             "user": user_name,
@@ -222,7 +3630,10 @@ def analyze_job_status(user_name: str, days: int = Query(default=30, le=365)):
             "total_jobs": total_jobs,
             "status_distribution": dict(status_counts),
             "success_rate": status_counts.get("DONE", 0) / total_jobs * 100 if total_jobs > 0 else 0,
-            "average_execution_time": avg_execution_time
+            "average_execution_time": avg_execution_time,
+            # Tail latencies over every completed job seen for this user
+            "execution_time_percentiles": merged_sketch("seconds", user_name=user["name"]).summary(),
+            "queue_wait_percentiles": merged_sketch("queue_wait_seconds", user_name=user["name"]).summary()
         }
 
     except Exception as e:
@@ -231,7 +3642,7 @@ def analyze_job_status(user_name: str, days: int = Query(default=30, le=365)):
 # ---------------------------
 # 5. Feature 3: Quantum Error Analyzer
 # ---------------------------
-@app.get("/analytics/errors/{user_name}")
+@app.get("/analytics/errors/{user_name}", response_model=ErrorAnalysisResponse)
 def analyze_quantum_errors(user_name: str):
     """Analyze quantum execution errors - Feature 3: Quantum Error Analyzer"""
     user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
@@ -240,18 +3651,18 @@ def analyze_quantum_errors(user_name: str):
 
     try:
         service = get_service(user)
-        jobs = service.jobs(limit=100)
+        jobs = list_jobs(service, limit=100)
         
         error_analysis = {
             "total_jobs": 0,
             "failed_jobs": 0,
-            "error_types": Counter(),
+            "error_types": {},
             "backend_reliability": defaultdict(lambda: {"total": 0, "failed": 0}),
             "common_errors": []
         }
         
         for job in jobs:
-            job_data = extract_job_data(job)
+            job_data = ingest_job(user, job)
             error_analysis["total_jobs"] += 1
             
             backend = job_data["backend"]
@@ -262,10 +3673,10 @@ def analyze_quantum_errors(user_name: str):
                 error_analysis["backend_reliability"][backend]["failed"] += 1
                 
                 if job_data["error_message"]:
-                    error_analysis["error_types"][job_data["error_message"]] += 1
                     error_analysis["common_errors"].append({
                         "job_id": job_data["job_id"],
                         "error": job_data["error_message"],
+                        "error_template": normalize_error_message(job_data["error_message"]),
                         "backend": backend
                     })
         
@@ -276,7 +3687,8 @@ def analyze_quantum_errors(user_name: str):
             backend_data["reliability_percent"] = ((total - failed) / total * 100) if total > 0 else 100
         
         error_analysis["overall_error_rate"] = (error_analysis["failed_jobs"] / error_analysis["total_jobs"] * 100) if error_analysis["total_jobs"] > 0 else 0
-        error_analysis["error_types"] = dict(error_analysis["error_types"])
+        # Error types are grouped by normalized template from the fingerprint index
+        error_analysis["error_types"] = {g["template"]: g["count"] for g in failure_groups(user["name"])}
         error_analysis["backend_reliability"] = dict(error_analysis["backend_reliability"])
         
         return {
@@ -290,16 +3702,29 @@ def analyze_quantum_errors(user_name: str):
 # ---------------------------
 # 6. Feature 4: Quantum Resource Meter
 # ---------------------------
-@app.get("/analytics/resources/{user_name}")
-def analyze_quantum_resources(user_name: str):
-    """Analyze quantum resource usage - Feature 4: Quantum Resource Meter"""
+@app.get("/analytics/resources/{user_name}", response_model=ResourceResponse)
+def analyze_quantum_resources(user_name: str, include_circuits: bool = False,
+                              days: Optional[int] = Query(default=None, ge=1, le=365)):
+    """Analyze quantum resource usage - Feature 4: Quantum Resource Meter
+
+    Without `days` the latest 50 jobs are analyzed. With it, totals, averages
+    and percentiles cover the whole period, adding the daily rollups for days
+    before the raw window; resource_distribution lists the raw jobs only.
+    Rollups have day granularity, so a rolled-up period starts at midnight UTC
+    of the cutoff day (reported as period_start).
+    """
     user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     try:
         service = get_service(user)
-        jobs = service.jobs(limit=50)
+        boundary = job_rollups.boundary(user["name"])
+        if days:
+            cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+            jobs = list_jobs(service, limit=300, created_after=max(cutoff_date, boundary) if boundary else cutoff_date)
+        else:
+            jobs = list_jobs(service, limit=50)
         
         resource_analysis = {
             "total_quantum_seconds": 0,
@@ -314,20 +3739,44 @@ def analyze_quantum_resources(user_name: str):
         
         quantum_seconds_list = []
         execution_seconds_list = []
+        jobs = list(jobs)
+        circuit_summaries = analyze_job_circuits(jobs) if include_circuits else {}
+        sketches = {"quantum_seconds": QuantileSketch(), "seconds": QuantileSketch()}
+        rolled_up_jobs = 0
+        
+        if days and boundary and cutoff_date < boundary:
+            cutoff_date = start_of_day(cutoff_date)
+            for _, _, _, row in job_rollups.query(user["name"], since=cutoff_date):
+                row_sketches = row["sketches"]
+                if "seconds" not in row_sketches and "quantum_seconds" not in row_sketches:
+                    continue
+                timed = max(sketch.count for sketch in row_sketches.values())
+                resource_analysis["total_quantum_seconds"] += row_sketches["quantum_seconds"].sum if "quantum_seconds" in row_sketches else 0
+                resource_analysis["total_execution_time"] += row_sketches["seconds"].sum if "seconds" in row_sketches else 0
+                resource_analysis["jobs_analyzed"] += timed
+                rolled_up_jobs += timed
+                for metric, sketch in row_sketches.items():
+                    sketches[metric].merge(sketch)
         
         for job in jobs:
-            job_data = extract_job_data(job)
+            job_data = ingest_job(user, job)
             
-            if job_data["usage"]:
-                q_seconds = job_data["usage"].get("quantum_seconds", 0)
-                e_seconds = job_data["usage"].get("seconds", 0)
+            usage = job_data["usage"] or {}
+            # Same rule as the rollup rows: a job counts when it reports either metric,
+            # and each sketch only sees the metrics that are present
+            if any(usage.get(metric) is not None for metric in ROLLUP_METRICS):
+                q_seconds = usage.get("quantum_seconds", 0)
+                e_seconds = usage.get("seconds", 0)
                 
-                resource_analysis["total_quantum_seconds"] += q_seconds
-                resource_analysis["total_execution_time"] += e_seconds
+                resource_analysis["total_quantum_seconds"] += q_seconds or 0
+                resource_analysis["total_execution_time"] += e_seconds or 0
                 resource_analysis["jobs_analyzed"] += 1
                 
                 quantum_seconds_list.append(q_seconds)
                 execution_seconds_list.append(e_seconds)
+                for metric in ROLLUP_METRICS:
+                    if usage.get(metric) is not None:
+                        sketches[metric].add(usage[metric])
                 
                 resource_analysis["resource_distribution"].append({
                     "job_id": job_data["job_id"],
@@ -336,12 +3785,34 @@ def analyze_quantum_resources(user_name: str):
                     "execution_seconds": e_seconds,
                     "status": job_data["status"]
                 })
+                if job_data["job_id"] in circuit_summaries:
+                    resource_analysis["resource_distribution"][-1]["circuits"] = circuit_summaries[job_data["job_id"]]
         
         # Calculate averages
         if resource_analysis["jobs_analyzed"] > 0:
             resource_analysis["average_resources"]["quantum_seconds"] = resource_analysis["total_quantum_seconds"] / resource_analysis["jobs_analyzed"]
             resource_analysis["average_resources"]["execution_seconds"] = resource_analysis["total_execution_time"] / resource_analysis["jobs_analyzed"]
         
+        if days:
+            resource_analysis["period_days"] = days
+            resource_analysis["period_start"] = cutoff_date.isoformat()
+            resource_analysis["rolled_up_jobs"] = rolled_up_jobs
+            resource_analysis["percentiles"] = {
+                "quantum_seconds": sketches["quantum_seconds"].summary(),
+                "execution_seconds": sketches["seconds"].summary()
+            }
+        
+        # Correlate quantum seconds with circuit size
+        if include_circuits:
+            sized = [r for r in resource_analysis["resource_distribution"] if r.get("circuits", {}).get("circuits")]
+            q_seconds = [r["quantum_seconds"] or 0 for r in sized]
+            resource_analysis["circuit_correlation"] = {
+                "jobs_with_circuits": len(sized),
+                "quantum_seconds_vs_depth": correlation([r["circuits"]["max_depth"] for r in sized], q_seconds),
+                "quantum_seconds_vs_width": correlation([r["circuits"]["max_width"] for r in sized], q_seconds),
+                "quantum_seconds_vs_two_qubit_gates": correlation([r["circuits"]["total_two_qubit_gates"] for r in sized], q_seconds)
+            }
+        
         return {
             "user": user_name,
             "resource_analysis": resource_analysis
@@ -353,20 +3824,20 @@ def analyze_quantum_resources(user_name: str):
 # ---------------------------
 # 7. Feature 5: Backend Performance Analyzer
 # ---------------------------
-@app.get("/analytics/backend-performance")
+@app.get("/analytics/backend-performance", response_model=BackendPerformanceResponse)
 def analyze_backend_performance():
     """Analyze backend performance across all users - Feature 5: Backend Performance Analyzer"""
     try:
         # Use first user's service to get backend info
         service = get_service(USERS[0])
-        backends = service.backends()
+        backends = runtime_call("backends", service.backends)
         
         backend_analysis = {}
         
         for backend in backends:
             try:
                 backend_name = backend.name
-                status = backend.status()
+                status = runtime_call("backend_status", backend.status)
                 
                 backend_info = {
                     "name": backend_name,
@@ -377,7 +3848,7 @@ def analyze_backend_performance():
                 
                 # Get backend properties
                 try:
-                    properties = backend.properties()
+                    properties = runtime_call("backend_properties", backend.properties)
                     if properties:
                         backend_info["last_update"] = str(getattr(properties, 'last_update_date', 'Unknown'))
                         backend_info["n_qubits"] = getattr(properties, 'n_qubits', 0)
@@ -386,7 +3857,7 @@ def analyze_backend_performance():
                 
                 # Get configuration
                 try:
-                    config = backend.configuration()
+                    config = runtime_call("backend_configuration", backend.configuration)
                     if config:
                         backend_info["max_shots"] = getattr(config, 'max_shots', 0)
                         backend_info["coupling_map"] = len(getattr(config, 'coupling_map', []))
@@ -412,17 +3883,24 @@ def analyze_backend_performance():
 # ---------------------------
 # 8. Feature 6: Historical Job Trends
 # ---------------------------
-@app.get("/analytics/trends/{user_name}")
+@app.get("/analytics/trends/{user_name}", response_model=TrendsResponse)
 def analyze_job_trends(user_name: str, days: int = Query(default=90, le=365)):
-    """Analyze historical job trends - Feature 6: Historical Job Trends"""
+    """Analyze historical job trends - Feature 6: Historical Job Trends
+
+    Days before the user's rollup boundary come from the daily rollups; only
+    the raw window after it is listed from the runtime. Rollups have
+    day granularity, so a rolled-up period starts at midnight UTC of the
+    cutoff day (reported as sources.period_start).
+    """
     user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     try:
         service = get_service(user)
-        cutoff_date = datetime.now() - timedelta(days=days)
-        jobs = service.jobs(limit=300, created_after=cutoff_date)
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+        boundary = job_rollups.boundary(user["name"])
+        jobs = list_jobs(service, limit=300, created_after=max(cutoff_date, boundary) if boundary else cutoff_date)
         
         trends_analysis = {
             "period_days": days,
@@ -434,9 +3912,19 @@ def analyze_job_trends(user_name: str, days: int = Query(default=90, le=365)):
         }
         
         backend_totals = Counter()
+        rolled_up_jobs = 0
+        
+        if boundary and cutoff_date < boundary:
+            cutoff_date = start_of_day(cutoff_date)
+            for date_str, backend, status, row in job_rollups.query(user["name"], since=cutoff_date):
+                trends_analysis["daily_job_counts"][date_str] += row["count"]
+                trends_analysis["backend_usage_over_time"][date_str][backend] += row["count"]
+                trends_analysis["status_trends"][date_str][status] += row["count"]
+                backend_totals[backend] += row["count"]
+                rolled_up_jobs += row["count"]
         
         for job in jobs:
-            job_data = extract_job_data(job)
+            job_data = ingest_job(user, job)
             
             # Parse date
             if job_data["creation_date"] and job_data["creation_date"] != "Unknown":
@@ -465,6 +3953,13 @@ def analyze_job_trends(user_name: str, days: int = Query(default=90, le=365)):
         if backend_totals:
             trends_analysis["most_used_backend"] = backend_totals.most_common(1)[0]
         
+        trends_analysis["sources"] = {
+            "raw_jobs": sum(backend_totals.values()) - rolled_up_jobs,
+            "rolled_up_jobs": rolled_up_jobs,
+            "raw_window_start": boundary.isoformat() if boundary else None,
+            "period_start": cutoff_date.isoformat()
+        }
+        
         return {
             "user": user_name,
             "trends_analysis": trends_analysis
@@ -476,7 +3971,7 @@ def analyze_job_trends(user_name: str, days: int = Query(default=90, le=365)):
 # ---------------------------
 # 9. Feature 7: User Job Analyzer (Researcher Mode)
 # ---------------------------
-@app.get("/analytics/all-users")
+@app.get("/analytics/all-users", response_model=AllUsersResponse)
 def analyze_all_users():
     """Analyze job activity across all users - Feature 7: User Job Analyzer"""
     try:
@@ -496,7 +3991,7 @@ def analyze_all_users():
         for user in USERS:
             try:
                 service = get_service(user)
-                jobs = service.jobs(limit=50)
+                jobs = list_jobs(service, limit=50)
                 
                 user_stats = {
                     "total_jobs": 0,
@@ -506,7 +4001,7 @@ def analyze_all_users():
                 }
                 
                 for job in jobs:
-                    job_data = extract_job_data(job)
+                    job_data = ingest_job(user, job)
                     user_stats["total_jobs"] += 1
                     user_stats["status_distribution"][job_data["status"]] += 1
                     user_stats["backend_usage"][job_data["backend"]] += 1
@@ -551,7 +4046,7 @@ def analyze_all_users():
 # ---------------------------
 # 10. Feature 8: Backend Usage Monitor
 # ---------------------------
-@app.get("/analytics/backend-usage/{user_name}")
+@app.get("/analytics/backend-usage/{user_name}", response_model=BackendUsageResponse)
 def monitor_backend_usage(user_name: str):
     """Monitor backend usage patterns - Feature 8: Backend Usage Monitor"""
     user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
@@ -560,7 +4055,7 @@ def monitor_backend_usage(user_name: str):
 
     try:
         service = get_service(user)
-        jobs = service.jobs(limit=100)
+        jobs = list_jobs(service, limit=100)
         
         backend_monitor = {
             "backend_usage_stats": defaultdict(lambda: {
@@ -578,10 +4073,10 @@ def monitor_backend_usage(user_name: str):
         }
         
         backend_job_counts = Counter()
-        execution_times_by_backend = defaultdict(list)
+        execution_times_by_backend = defaultdict(lambda: [0, 0])  # [total seconds, job count]
         
         for job in jobs:
-            job_data = extract_job_data(job)
+            job_data = ingest_job(user, job)
             backend = job_data["backend"]
             
             backend_monitor["backend_usage_stats"][backend]["job_count"] += 1
@@ -595,15 +4090,20 @@ def monitor_backend_usage(user_name: str):
                 backend_monitor["backend_usage_stats"][backend]["total_quantum_seconds"] += q_seconds
             
             if job_data["usage"].get("seconds"):
-                execution_times_by_backend[backend].append(job_data["usage"]["seconds"])
+                execution_times_by_backend[backend][0] += job_data["usage"]["seconds"]
+                execution_times_by_backend[backend][1] += 1
         
         # Calculate averages and success rates
         for backend, stats in backend_monitor["backend_usage_stats"].items():
             if stats["job_count"] > 0:
                 stats["success_rate"] = (stats["success_count"] / stats["job_count"]) * 100
                 
-                if execution_times_by_backend[backend]:
-                    stats["avg_execution_time"] = sum(execution_times_by_backend[backend]) / len(execution_times_by_backend[backend])
+                total_seconds, timed_jobs = execution_times_by_backend[backend]
+                if timed_jobs:
+                    stats["avg_execution_time"] = total_seconds / timed_jobs
+                
+                stats["execution_time_percentiles"] = merged_sketch("seconds", user_name=user["name"], backend=backend).summary()
+                stats["quantum_seconds_percentiles"] = merged_sketch("quantum_seconds", user_name=user["name"], backend=backend).summary()
         
         # Summary statistics
         backend_monitor["usage_summary"]["total_backends_used"] = len(backend_monitor["backend_usage_stats"])
@@ -635,8 +4135,8 @@ def monitor_backend_usage(user_name: str):
 # ---------------------------
 # 11. Feature 9: Job Failure Insights
 # ---------------------------
-@app.get("/analytics/failures/{user_name}")
-def analyze_job_failures(user_name: str):
+@app.get("/analytics/failures/{user_name}", response_model=FailureResponse)
+def analyze_job_failures(user_name: str, include_circuits: bool = False):
     """Analyze job failure patterns - Feature 9: Job Failure Insights"""
     user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
     if not user:
@@ -644,14 +4144,14 @@ def analyze_job_failures(user_name: str):
 
     try:
         service = get_service(user)
-        jobs = service.jobs(limit=150)
+        jobs = list_jobs(service, limit=150)
         
         failure_analysis = {
             "total_jobs_analyzed": 0,
             "failed_jobs": [],
             "failure_patterns": {
                 "by_backend": defaultdict(int),
-                "by_error_type": Counter(),
+                "by_error_type": {},
                 "by_time_pattern": defaultdict(int)
             },
             "failure_insights": {
@@ -661,11 +4161,22 @@ def analyze_job_failures(user_name: str):
             }
         }
         
+        jobs = list(jobs)
+        circuit_summaries = analyze_job_circuits(jobs) if include_circuits else {}
+        size_buckets = defaultdict(lambda: {"total": 0, "failed": 0})
+        
         for job in jobs:
-            job_data = extract_job_data(job)
+            job_data = ingest_job(user, job)
             failure_analysis["total_jobs_analyzed"] += 1
             
-            if job_data["status"] in ["ERROR", "CANCELLED", "FAILED"]:
+            circuits = circuit_summaries.get(job_data["job_id"])
+            if circuits and circuits["circuits"]:
+                bucket = size_buckets[depth_bucket(circuits["max_depth"])]
+                bucket["total"] += 1
+                if job_data["status"] in FAILED_STATUSES:
+                    bucket["failed"] += 1
+            
+            if job_data["status"] in FAILED_STATUSES:
                 failure_info = {
                     "job_id": job_data["job_id"],
                     "backend": job_data["backend"],
@@ -677,9 +4188,6 @@ def analyze_job_failures(user_name: str):
                 failure_analysis["failed_jobs"].append(failure_info)
                 failure_analysis["failure_patterns"]["by_backend"][job_data["backend"]] += 1
                 
-                if job_data["error_message"]:
-                    failure_analysis["failure_patterns"]["by_error_type"][job_data["error_message"]] += 1
-                
                 # Time pattern analysis
                 if job_data["creation_date"] and job_data["creation_date"] != "Unknown":
                     try:
@@ -697,11 +4205,21 @@ def analyze_job_failures(user_name: str):
                 "failure_count": most_unreliable[1]
             }
         
-        failure_analysis["failure_insights"]["common_failure_reasons"] = failure_analysis["failure_patterns"]["by_error_type"].most_common(5)
+        # Error groups come straight from the fingerprint index
+        error_groups = failure_groups(user["name"])
+        failure_analysis["failure_patterns"]["by_error_type"] = {g["template"]: g["count"] for g in error_groups}
+        failure_analysis["failure_insights"]["common_failure_reasons"] = [
+            {
+                "fingerprint": g["fingerprint"],
+                "template": g["template"],
+                "count": g["count"],
+                "example_job_ids": g["example_job_ids"]
+            }
+            for g in error_groups[:5]
+        ]
         
         # Convert defaultdicts to regular dicts
         failure_analysis["failure_patterns"]["by_backend"] = dict(failure_analysis["failure_patterns"]["by_backend"])
-        failure_analysis["failure_patterns"]["by_error_type"] = dict(failure_analysis["failure_patterns"]["by_error_type"])
         failure_analysis["failure_patterns"]["by_time_pattern"] = dict(failure_analysis["failure_patterns"]["by_time_pattern"])
         
         # Calculate overall failure rate
@@ -711,6 +4229,11 @@ def analyze_job_failures(user_name: str):
         
         failure_analysis["overall_failure_rate"] = failure_rate
         
+        if include_circuits:
+            for bucket in size_buckets.values():
+                bucket["failure_rate"] = bucket["failed"] / bucket["total"] * 100
+            failure_analysis["failure_patterns"]["by_circuit_depth"] = dict(size_buckets)
+        
         return {
             "user": user_name,
             "failure_analysis": failure_analysis
@@ -722,13 +4245,13 @@ def analyze_job_failures(user_name: str):
 # ---------------------------
 # 12. Feature 10: Smart Scheduler Recommendation
 # ---------------------------
-@app.get("/recommendations/smart-scheduler")
-def smart_scheduler_recommendation():
+@app.get("/recommendations/smart-scheduler", response_model=SchedulerResponse)
+def smart_scheduler_recommendation(width: Optional[int] = Query(default=None, ge=1)):
     """Get smart backend recommendations - Feature 10: Smart Scheduler Recommendation"""
     try:
         # Use first user's service to get backend info
         service = get_service(USERS[0])
-        backends = service.backends()
+        backends = runtime_call("backends", service.backends)
         
         recommendations = {
             "recommended_backends": [],
@@ -739,13 +4262,15 @@ def smart_scheduler_recommendation():
                 "reliability": "Based on historical data"
             }
         }
+        if width:
+            recommendations["recommendation_criteria"]["layout_quality"] = f"Fidelity of the best {width}-qubit subset"
         
         backend_scores = []
         
         for backend in backends:
             try:
                 backend_name = backend.name
-                status = backend.status()
+                status = runtime_call("backend_status", backend.status)
                 
                 # Base score calculation
                 score = 0
@@ -767,12 +4292,23 @@ def smart_scheduler_recommendation():
                     
                     # Additional points for backend properties
                     try:
-                        properties = backend.properties()
+                        properties = runtime_call("backend_properties", backend.properties)
                         if properties:
                             score += 10  # Bonus for having properties available
                     except:
                         pass
                     
+                    # Layout quality for the requested circuit width
+                    layout = None
+                    if width:
+                        try:
+                            layout = get_best_layout(backend, width)
+                        except Exception:
+                            layout = None
+                        if layout is None:
+                            continue  # Backend cannot fit the circuit
+                        score += int(10 * layout["estimated_fidelity"])
+                    
                     backend_info = {
                         "backend_name": backend_name,
                         "operational": operational,
@@ -781,6 +4317,11 @@ def smart_scheduler_recommendation():
                         "status_message": getattr(status, 'status_msg', 'No message'),
                         "recommendation": "Recommended" if score >= 60 else "Available" if score >= 50 else "Not recommended"
                     }
+                    if layout:
+                        backend_info["suggested_layout"] = {
+                            "qubits": layout["qubits"],
+                            "estimated_fidelity": layout["estimated_fidelity"]
+                        }
                     
                     backend_scores.append(backend_info)
                     
@@ -802,11 +4343,528 @@ def smart_scheduler_recommendation():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ---------------------------
+# 13. Failure Fingerprints
+# ---------------------------
+@app.get("/analytics/error-fingerprints", response_model=ErrorFingerprintsResponse)
+def get_error_fingerprints(user_name: Optional[str] = None, top: int = Query(default=20, le=200)):
+    """Grouped failure templates from the fingerprint index, optionally for one user"""
+    if user_name:
+        user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_name = user["name"]
+
+    groups = failure_groups(user_name, top=top)
+    return {
+        "user": user_name,
+        "total_groups": len(groups),
+        "groups": groups,
+        "timestamp": datetime.now().isoformat()
+    }
+
+# ---------------------------
+# 14. Job Results
+# ---------------------------
+@app.get("/jobs/{user_name}/{job_id}/result", response_model=JobResultResponse)
+def get_job_result(user_name: str, job_id: str, top: Optional[int] = Query(default=None, ge=1)):
+    """Per-pub counts or expectation values for a finished job, served from the result cache"""
+    user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    try:
+        arrays = get_job_result_arrays(user, job_id)
+        return {
+            "user": user_name,
+            "job_id": job_id,
+            "pubs": summarize_result_arrays(arrays, top=top)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/results/{user_name}/merged-counts", response_model=MergedCountsResponse)
+def get_merged_counts(
+    user_name: str,
+    job_ids: List[str] = Query(...),
+    register: Optional[str] = None,
+    top: Optional[int] = Query(default=None, ge=1)
+):
+    """Counts histogram merged across many finished jobs"""
+    user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    try:
+        merged = merge_counts([get_job_result_arrays(user, job_id) for job_id in job_ids], register=register)
+        bitstrings = merged["bitstrings"][:top] if top else merged["bitstrings"]
+        return {
+            "user": user_name,
+            "job_ids": job_ids,
+            "register": register,
+            "total_shots": int(merged["counts"].sum()),
+            "distinct_outcomes": int(merged["counts"].size),
+            "histogram": dict(zip(bitstrings.tolist(), merged["counts"][:len(bitstrings)].tolist()))
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/results/cache-stats", response_model=CacheStatsResponse)
+def get_result_cache_stats():
+    """Size and occupancy of the on-disk result cache"""
+    return result_cache.stats()
+
+# ---------------------------
+# 15. Circuit Analysis
+# ---------------------------
+@app.get("/analytics/circuits/{user_name}", response_model=CircuitAnalysisResponse)
+def analyze_circuits(user_name: str, limit: int = Query(default=50, le=300)):
+    """Depth, width, two-qubit gate counts and gate histograms for a user's job inputs"""
+    user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    try:
+        service = get_service(user)
+        summaries = analyze_job_circuits(list_jobs(service, limit=limit))
+        return {
+            "user": user_name,
+            "jobs_analyzed": len(summaries),
+            "circuits_cached": len(_circuit_cache["circuits"]),
+            "jobs": summaries
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------
+# 16. Pre-submission Backend Estimate
+# ---------------------------
+class EstimateRequest(BaseModel):
+    qasm: str
+    shots: int = 4000
+    backends: Optional[List[str]] = None
+
+@app.post("/recommendations/estimate", response_model=EstimateResponse)
+def estimate_circuit(request: EstimateRequest):
+    """Rank backends for a circuit by transpiled success probability and expected turnaround"""
+    try:
+        circuit = load_qasm(request.qasm)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid QASM: {str(e)}")
+
+    try:
+        candidates = []
+        for backend in get_cached_backends():
+            if request.backends and backend.name not in request.backends:
+                continue
+            try:
+                if getattr(get_backend_status(backend), 'operational', False) and backend.num_qubits >= circuit.num_qubits:
+                    candidates.append(backend)
+            except Exception:
+                continue
+
+        ranked = estimate_backends(request.qasm, candidates, request.shots)
+        return {
+            "circuit": {"num_qubits": circuit.num_qubits, "depth": circuit.depth(), "size": circuit.size()},
+            "shots": request.shots,
+            "total_backends_analyzed": len(ranked),
+            "estimates": ranked,
+            "best_choice": ranked[0] if ranked and "score" in ranked[0] else None,
+            "analysis_timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------
+# 17. Delta Sync
+# ---------------------------
+@app.get("/jobs/{user_name}/changes", response_model=JobChangesResponse)
+def get_job_changes(user_name: str, cursor: Optional[str] = None, limit: int = Query(default=100, le=300)):
+    """Jobs created or changed since an opaque cursor, plus the cursor for the next poll.
+
+    A missing or stale cursor returns a full snapshot with "reset": true.
+    """
+    user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    try:
+        refresh_user_jobs(user, limit)
+        since_seq = change_log.decode_cursor(cursor)
+        changes, next_seq = change_log.since(user["name"], since_seq or 0)
+
+        has_more = False
+        if since_seq is None:
+            # Snapshot: the most recently changed jobs, newest first
+            changes = changes[::-1][:limit]
+        elif len(changes) > limit:
+            # Page through a large delta oldest first so no change is skipped
+            changes = changes[:limit]
+            next_seq = changes[-1][1]
+            has_more = True
+
+        jobs = []
+        for job_id, _ in changes:
+            record = job_index.jobs.get(job_id)
+            if record is not None:
+                jobs.append(record["job"])
+
+        return {
+            "user": user_name,
+            "reset": since_seq is None,
+            "cursor": change_log.encode_cursor(next_seq),
+            "has_more": has_more,
+            "total_changed": len(jobs),
+            "jobs": jobs
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------
+# 18. Calibration Analytics
+# ---------------------------
+@app.get("/analytics/calibration", response_model=CalibrationResponse)
+def analyze_calibration(backend_name: Optional[str] = None, include_qubits: bool = False):
+    """Per-qubit calibration distributions for every backend (or one), cached per recalibration"""
+    try:
+        reports = {}
+        for backend in get_cached_backends():
+            if backend_name and backend.name != backend_name:
+                continue
+            try:
+                calibration = get_calibration(backend)
+                if calibration is None:
+                    continue
+                report = calibration_report(calibration)
+                if include_qubits:
+                    report["qubits"] = {
+                        name: np.where(np.isfinite(calibration[name]), calibration[name], None).tolist()
+                        for name in ("t1_us", "t2_us", "readout_error", "single_qubit_error")
+                    }
+                    report["edges"] = [
+                        {"qubits": edge, "error": error}
+                        for edge, error in zip(calibration["edges"].tolist(), calibration["two_qubit_error"].tolist())
+                    ]
+                reports[backend.name] = report
+            except Exception as backend_error:
+                reports[backend.name] = {"error": str(backend_error)}
+
+        if backend_name and backend_name not in reports:
+            raise HTTPException(status_code=404, detail="Backend not found")
+
+        return {
+            "total_backends": len(reports),
+            "calibration": reports,
+            "timestamp": datetime.now().isoformat()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------
+# 19. Best Qubit Layout
+# ---------------------------
+@app.get("/recommendations/best-qubits", response_model=BestQubitsResponse)
+def recommend_best_qubits(width: int = Query(..., ge=1), backend_name: Optional[str] = None):
+    """Connected qubit subset with the lowest combined gate and readout error on each backend"""
+    try:
+        layouts = []
+        for backend in get_cached_backends():
+            if backend_name and backend.name != backend_name:
+                continue
+            try:
+                layout = get_best_layout(backend, width)
+            except Exception as backend_error:
+                layouts.append({"backend_name": backend.name, "error": str(backend_error)})
+                continue
+            if layout:
+                layouts.append({"backend_name": backend.name, **layout})
+
+        layouts.sort(key=lambda l: l.get("estimated_fidelity", -1), reverse=True)
+        return {
+            "width": width,
+            "total_backends": len(layouts),
+            "layouts": layouts,
+            "best_choice": layouts[0] if layouts and "qubits" in layouts[0] else None,
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------
+# 20. Latency Percentiles
+# ---------------------------
+@app.get("/analytics/percentiles", response_model=PercentilesResponse)
+def get_latency_percentiles(user_name: Optional[str] = None, backend: Optional[str] = None):
+    """p50/p90/p99/max of execution, quantum and queue-wait seconds, merged across users and backends"""
+    if user_name:
+        user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_name = user["name"]
+
+    with _sketch_lock:
+        backends = sorted({key[1] for key in _sketches if not user_name or key[0] == user_name})
+
+    return {
+        "user": user_name,
+        "backend": backend,
+        "overall": {metric: merged_sketch(metric, user_name, backend).summary() for metric in SKETCH_METRICS},
+        "by_backend": {
+            name: {metric: merged_sketch(metric, user_name, name).summary() for metric in SKETCH_METRICS}
+            for name in backends if not backend or name == backend
+        },
+        "relative_accuracy": SKETCH_RELATIVE_ACCURACY,
+        "timestamp": datetime.now().isoformat()
+    }
+
+# ---------------------------
+# 21. Debug: Request Profiles
+# ---------------------------
+PROFILE_FILES = {
+    "folded": ("folded", "text/plain"),
+    "tracemalloc": ("tracemalloc", "application/octet-stream"),
+    "summary": ("json", "application/json")
+}
+
+def require_profile_token(request: Request) -> None:
+    if not PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiling_requested(request):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+@app.get("/debug/profiles", response_model=ProfilesResponse)
+def list_profiles(request: Request):
+    """Stored request profiles, newest first"""
+    require_profile_token(request)
+    profiles = []
+    if os.path.isdir(PROFILE_DIR):
+        for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+            if name.endswith(".json"):
+                summary = load_json(os.path.join(PROFILE_DIR, name), None)
+                if summary:
+                    summary.pop("top_allocations", None)
+                    profiles.append(summary)
+    return {"total_profiles": len(profiles), "max_stored": PROFILE_MAX_STORED, "profiles": profiles}
+
+@app.get("/debug/profiles/{profile_id}/{kind}")
+def download_profile(profile_id: str, kind: str, request: Request):
+    """Download a profile as folded stacks (flame graph), tracemalloc snapshot or JSON summary"""
+    require_profile_token(request)
+    if kind not in PROFILE_FILES or not re.fullmatch(r"[\w-]+", profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    suffix, media_type = PROFILE_FILES[kind]
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.{suffix}")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+# ---------------------------
+# 22. Batched Job Submission
+# ---------------------------
+class CircuitSubmission(BaseModel):
+    user_name: str
+    backend: str
+    qasm: str
+    shots: int = 4000
+    # Pauli strings to estimate instead of sampling (local backend only)
+    observables: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+
+class SubmitRequest(BaseModel):
+    circuits: List[CircuitSubmission]
+    mode: str = "batch"
+
+@app.post("/jobs/submit", response_model=SubmitResponse)
+def submit_circuits(request: SubmitRequest):
+    """Queue circuits for submission; each (user, backend) window runs as one Batch or Session.
+
+    Circuits sent to the `local` backend run right away on the statevector
+    primitives when they fit LOCAL_MAX_QUBITS / LOCAL_MAX_DEPTH.
+    """
+    if request.mode not in EXECUTION_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown mode, expected one of {sorted(EXECUTION_MODES)}")
+
+    prepared = []
+    local_items = defaultdict(list)
+    for index, item in enumerate(request.circuits):
+        user = next((u for u in USERS if u["name"].lower() == item.user_name.lower()), None)
+        if not user:
+            raise HTTPException(status_code=404, detail=f"User not found: {item.user_name}")
+        if item.backend == LOCAL_BACKEND:
+            try:
+                qpy_bytes, digest = prepare_local_circuit(item.qasm, item.observables)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Invalid QASM: {str(e)}")
+            local_items[user["name"]].append({"index": index, "qpy": qpy_bytes, "digest": digest, "shots": item.shots,
+                                              "observables": item.observables, "tags": item.tags})
+            continue
+        if item.observables:
+            raise HTTPException(status_code=400, detail="Observables are only supported on the local backend")
+        try:
+            load_qasm(item.qasm)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid QASM: {str(e)}")
+        prepared.append((index, user, item))
+
+    submissions = [None] * len(request.circuits)
+    for user_name, items in local_items.items():
+        user = next(u for u in USERS if u["name"] == user_name)
+        for item, job_data in zip(items, run_local_jobs(user, items)):
+            submissions[item["index"]] = {
+                "user": user_name,
+                "backend": LOCAL_BACKEND,
+                "mode": "local",
+                "shots": item["shots"],
+                "status": "SUBMITTED" if job_data["status"] == "DONE" else "FAILED",
+                "job_id": job_data["job_id"],
+                "pub_index": 0,
+                "error": job_data["error_message"],
+                "cached_result": job_data["metrics"]["cached_result"]
+            }
+    for index, user, item in prepared:
+        submissions[index] = queue_submission(user, item.backend, request.mode, item.qasm, item.shots)
+    return {
+        "mode": request.mode,
+        "batch_window_seconds": SUBMIT_BATCH_WINDOW,
+        "total_submissions": len(submissions),
+        "submissions": submissions
+    }
+
+@app.get("/jobs/submissions/{submission_id}", response_model=Submission)
+def get_submission(submission_id: str):
+    """Status of a queued circuit and, once submitted, its job_id and pub index"""
+    with _submission_lock:
+        submission = _submissions.get(submission_id)
+        if submission is None:
+            raise HTTPException(status_code=404, detail="Submission not found")
+        return dict(submission)
+
+# ---------------------------
+# 23. Ad-hoc Analytics Query
+# ---------------------------
+@app.get("/analytics/query", response_model=QueryResponse)
+def analytics_query(
+    group_by: List[str] = Query(default=[]),
+    agg: List[str] = Query(default=["count"]),
+    user_name: Optional[str] = None,
+    backend: Optional[str] = None,
+    status: Optional[str] = None,
+    program_id: Optional[str] = None,
+    tag: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    sort: Optional[str] = None,
+    limit: int = Query(default=1000, le=10000)
+):
+    """Group-by aggregation over ingested job history, e.g. group_by=backend&group_by=day&agg=count&agg=p90:seconds"""
+    if user_name:
+        user = next((u for u in USERS if u["name"].lower() == user_name.lower()), None)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_name = user["name"]
+
+    filters = {
+        "user": user_name,
+        "backend": backend,
+        "status": status.upper() if status else None,
+        "program_id": program_id,
+        "tag": tag,
+        "created_after": parse_job_datetime(created_after) if created_after else None,
+        "created_before": parse_job_datetime(created_before) if created_before else None
+    }
+    try:
+        result = run_job_query(group_by, agg, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    sort_key = sort or agg[0]
+    if sort_key not in agg and sort_key not in group_by:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort_key}'")
+    if sort_key in agg:
+        # Largest aggregate first, groups without a value last
+        groups = sorted(result["groups"], key=lambda g: (g[sort_key] is not None, g[sort_key] or 0), reverse=True)
+    else:
+        groups = sorted(result["groups"], key=lambda g: g[sort_key])
+
+    return {
+        "group_by": group_by,
+        "aggregates": agg,
+        "filters": {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in filters.items() if v},
+        "rows_scanned": result["rows_scanned"],
+        "total_groups": len(groups),
+        "groups": groups[:limit]
+    }
+
+# ---------------------------
+# 24. Calibration Drift
+# ---------------------------
+@app.get("/backends/{backend_name}/drift", response_model=DriftResponse)
+def backend_calibration_drift(backend_name: str, weeks: int = Query(8, ge=1, le=104)):
+    """Week-over-week change in T1, T2, readout and gate errors from the stored calibration history"""
+    try:
+        if not calibration_history.months(backend_name):
+            # Nothing collected yet: take a first snapshot if the backend exists
+            if backend_name not in {b.name for b in get_cached_backends()}:
+                raise HTTPException(status_code=404, detail="Backend not found")
+            collect_calibration_history()
+        drift = calibration_drift(backend_name, weeks)
+        drift["timestamp"] = datetime.now().isoformat()
+        return drift
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ---------------------------
+# 25. Debug: Request Traces
+# ---------------------------
+@app.get("/debug/traces", response_model=TracesResponse)
+def list_traces(
+    request: Request,
+    order: str = Query(default="recent", pattern="^(recent|slowest)$"),
+    path: Optional[str] = None,
+    min_ms: float = 0,
+    limit: int = Query(default=50, le=TRACE_RECENT)
+):
+    """Recent or slowest request traces with per-span-kind totals"""
+    require_profile_token(request)
+    with _trace_lock:
+        if order == "slowest":
+            traces = [entry[2] for entry in sorted(_slowest_traces, reverse=True)]
+        else:
+            traces = list(reversed(_recent_traces))
+    traces = [t for t in traces if (not path or t.path.startswith(path)) and t.duration * 1000 >= min_ms]
+    return {
+        "order": order,
+        "tracing_enabled": TRACING_ENABLED,
+        "total_traces": len(traces),
+        "traces": [t.summary() for t in traces[:limit]]
+    }
+
+@app.get("/debug/traces/{trace_id}", response_model=TraceDetail)
+def get_trace(trace_id: str, request: Request, format: str = Query(default="json", pattern="^(json|text)$")):
+    """Waterfall of one request's spans, as JSON or as a plain-text chart"""
+    require_profile_token(request)
+    trace = find_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (it may have been evicted)")
+    if format == "text":
+        return PlainTextResponse(render_waterfall(trace))
+    return dict(trace.summary(), waterfall=trace.waterfall(), dropped_spans=trace.dropped)
+
 # ---------------------------
 # Additional Utility Endpoints
 # ---------------------------
 
-@app.get("/users")
+@app.get("/users", response_model=UsersResponse)
 def get_all_users():
     """Get list of all available users"""
     return {
@@ -814,7 +4872,7 @@ def get_all_users():
         "users": [user["name"] for user in USERS]
     }
 
-@app.get("/health")
+@app.get("/health", response_model=HealthResponse)
 def health_check():
     """Detailed health check"""
     return {
@@ -822,5 +4880,23 @@ def health_check():
         "version": "2.0",
         "features_available": 10,
         "total_users": len(USERS),
+        "admission": {name: limiter.stats() for name, limiter in {**_class_limiters, **_route_limiters}.items()},
         "timestamp": datetime.now().isoformat()
-    }
\ No newline at end of file
+    }
+
+@app.on_event("startup")
+def startup_event():
+    _collector_stop.clear()
+    if CALIBRATION_COLLECT_INTERVAL > 0:
+        threading.Thread(target=calibration_collector_loop, daemon=True).start()
+    if JOB_RAW_RETENTION_DAYS > 0 and JOB_COMPACT_INTERVAL > 0:
+        threading.Thread(target=job_compactor_loop, daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    _collector_stop.set()
+    result_cache.flush()
+    flush_failure_index()
+    flush_circuit_cache()
+    if _circuit_pool is not None:
+        _circuit_pool.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from qiskit_ibm_runtime import QiskitRuntimeService
+import cassette
 
 app = FastAPI()
 
@@ -62,11 +63,11 @@ def get_jobs(user_name: str):
         return {"error": "User not found"}
 
     try:
-        service = QiskitRuntimeService(
+        service = cassette.service_for(user, lambda: QiskitRuntimeService(
             channel="ibm_cloud",
             token=user["api_key"],
             instance=user["instance"]
-        )
+        ))
 
         jobs = service.jobs(limit=5)
         job_list = []
@@ -1,10 +1,15 @@
 from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from qiskit_ibm_runtime import QiskitRuntimeService
 from datetime import datetime, timedelta
-from typing import Dict, List
-from collections import defaultdict, Counter
+from typing import Dict, List, Optional
+from collections import defaultdict, Counter, deque
 import asyncio
+import itertools
+import json
+import os
+import time
 import traceback
+import cassette
 
 app = FastAPI(title="Quantum Job Tracker Backend", version="2.2")
 
@@ -50,18 +55,36 @@ USERS = [
 ]
 
 NOTIFY_POLL_INTERVAL = 15
+# Events kept for replay to reconnecting clients; set NOTIFY_EVENT_LOG_PATH to persist them
+NOTIFY_EVENT_LOG_SIZE = int(os.environ.get("NOTIFY_EVENT_LOG_SIZE", 10000))
+NOTIFY_EVENT_LOG_PATH = os.environ.get("NOTIFY_EVENT_LOG_PATH")
 _last_seen_job_status: Dict[str, str] = {}
 _active_websockets: List[WebSocket] = []
+_event_log: deque = deque(maxlen=NOTIFY_EVENT_LOG_SIZE)
+_event_seq = 0
+_event_log_file_lines = 0
+# Events waiting to be appended to NOTIFY_EVENT_LOG_PATH by the writer task
+_event_persist_pending: List[Dict] = []
+_event_persist_task: Optional[asyncio.Task] = None
+
+# Backend reliability alerts: EWMA smoothing, thresholds and hysteresis for recovery
+RELIABILITY_EWMA_ALPHA = 0.2
+RELIABILITY_MIN_SAMPLES = 5
+FAILURE_RATE_ALERT = 0.3
+QUEUE_GROWTH_ALERT = 20.0  # pending jobs per minute
+ALERT_RECOVERY_RATIO = 0.5
+FAILED_STATUSES = ("ERROR", "FAILED")
+TERMINAL_STATUSES = ("DONE", "ERROR", "FAILED", "CANCELLED")
 
 # ---------------------------
 # Helpers
 # ---------------------------
 def get_service(user: Dict) -> QiskitRuntimeService:
-    return QiskitRuntimeService(
+    return cassette.service_for(user, lambda: QiskitRuntimeService(
         channel="ibm_cloud",
         token=user["api_key"],
         instance=user["instance"]
-    )
+    ))
 
 def safe_get_attr(obj, attr, default="Unknown"):
     try:
@@ -139,6 +162,165 @@ def extract_job_data(job) -> Dict:
     except Exception as e:
         return {"job_id": "Error", "status": "Error", "backend": "Error", "error": str(e)}
 
+# ---------------------------
+# Event log
+# ---------------------------
+def load_event_log():
+    """Restore the ring log (and sequence counter) from NOTIFY_EVENT_LOG_PATH if set"""
+    global _event_seq, _event_log_file_lines
+    if not NOTIFY_EVENT_LOG_PATH or not os.path.exists(NOTIFY_EVENT_LOG_PATH):
+        return
+    with open(NOTIFY_EVENT_LOG_PATH) as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            _event_log.append(event)
+            _event_log_file_lines += 1
+    if _event_log:
+        _event_seq = _event_log[-1]["seq"]
+
+def persist_events(events: List[Dict], snapshot: Optional[List[Dict]] = None):
+    """Append events to the on-disk log, or rewrite it from a snapshot of the ring (runs in a thread)"""
+    if snapshot is not None:
+        tmp_path = f"{NOTIFY_EVENT_LOG_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(json.dumps(e) + "\n" for e in snapshot)
+        os.replace(tmp_path, NOTIFY_EVENT_LOG_PATH)
+    else:
+        with open(NOTIFY_EVENT_LOG_PATH, "a") as f:
+            f.writelines(json.dumps(e) + "\n" for e in events)
+
+async def drain_event_persistence():
+    """Write pending events in batches off the event loop, compacting the file to the ring once it doubles"""
+    global _event_log_file_lines
+    while _event_persist_pending:
+        events = list(_event_persist_pending)
+        _event_persist_pending.clear()
+        # The ring is only read on the event loop; the thread gets a copy
+        compact = _event_log_file_lines + len(events) >= 2 * NOTIFY_EVENT_LOG_SIZE
+        snapshot = list(_event_log) if compact else None
+        try:
+            await asyncio.to_thread(persist_events, events, snapshot)
+            _event_log_file_lines = len(snapshot) if compact else _event_log_file_lines + len(events)
+        except OSError:
+            traceback.print_exc()
+
+def events_since(since: int) -> List[Dict]:
+    """Logged events with seq > since, oldest first"""
+    if not _event_log or since >= _event_log[-1]["seq"]:
+        return []
+    # seqs are contiguous within the ring, so the events wanted are the last (latest - since) of it
+    count = min(len(_event_log), _event_log[-1]["seq"] - since)
+    events = list(itertools.islice(reversed(_event_log), count))
+    events.reverse()
+    return events
+
+async def publish_event(event: Dict):
+    """Sequence an event, append it to the log and push it to connected clients"""
+    global _event_seq, _event_persist_task
+    _event_seq += 1
+    event = {"seq": _event_seq, **event}
+    _event_log.append(event)
+    if NOTIFY_EVENT_LOG_PATH:
+        _event_persist_pending.append(event)
+        if _event_persist_task is None or _event_persist_task.done():
+            _event_persist_task = asyncio.create_task(drain_event_persistence())
+    for ws in list(_active_websockets):
+        try:
+            await ws.send_json(event)
+        except Exception:
+            pass
+
+# ---------------------------
+# Backend reliability monitor
+# ---------------------------
+class BackendHealth:
+    """Per-backend EWMA failure rate and queue growth, updated in O(1) per observation"""
+
+    def __init__(self):
+        self.failure_rate = 0.0
+        self.completions = 0
+        self.queue_growth = 0.0
+        self.pending_jobs: Optional[int] = None
+        self.pending_sampled_at: Optional[float] = None
+        self.alerts: Dict[str, bool] = {"failure_rate": False, "queue_growth": False}
+
+    def record_completion(self, failed: bool):
+        self.completions += 1
+        # Seed with the first outcome so one early failure does not read as a 20% rate
+        alpha = 1.0 if self.completions == 1 else RELIABILITY_EWMA_ALPHA
+        self.failure_rate += alpha * ((1.0 if failed else 0.0) - self.failure_rate)
+
+    def record_pending(self, pending_jobs: int, now: float):
+        if self.pending_jobs is not None and now > self.pending_sampled_at:
+            rate = (pending_jobs - self.pending_jobs) / ((now - self.pending_sampled_at) / 60)
+            self.queue_growth += RELIABILITY_EWMA_ALPHA * (rate - self.queue_growth)
+        self.pending_jobs = pending_jobs
+        self.pending_sampled_at = now
+
+    def check(self, kind: str) -> Optional[str]:
+        """'degraded' or 'recovered' when an alert state flips, else None"""
+        if kind == "failure_rate":
+            if self.completions < RELIABILITY_MIN_SAMPLES:
+                return None
+            value, threshold = self.failure_rate, FAILURE_RATE_ALERT
+        else:
+            value, threshold = self.queue_growth, QUEUE_GROWTH_ALERT
+        if not self.alerts[kind] and value > threshold:
+            self.alerts[kind] = True
+            return "degraded"
+        if self.alerts[kind] and value < threshold * ALERT_RECOVERY_RATIO:
+            self.alerts[kind] = False
+            return "recovered"
+        return None
+
+    def snapshot(self) -> Dict:
+        return {"failure_rate": self.failure_rate, "completions": self.completions,
+                "queue_growth_per_min": self.queue_growth, "pending_jobs": self.pending_jobs,
+                "alerts": dict(self.alerts)}
+
+_backend_health: Dict[str, BackendHealth] = defaultdict(BackendHealth)
+
+async def publish_health_alert(backend_name: str, kind: str, state: str):
+    health = _backend_health[backend_name]
+    await publish_event({
+        "type": "backend_alert" if state == "degraded" else "backend_recovered",
+        "backend": backend_name,
+        "metric": kind,
+        "value": health.failure_rate if kind == "failure_rate" else health.queue_growth,
+        "threshold": FAILURE_RATE_ALERT if kind == "failure_rate" else QUEUE_GROWTH_ALERT,
+        "timestamp": datetime.now().isoformat()
+    })
+
+async def observe_job_transition(backend_name: str, status: str):
+    if status not in TERMINAL_STATUSES or status == "CANCELLED":
+        return
+    _backend_health[backend_name].record_completion(status in FAILED_STATUSES)
+    state = _backend_health[backend_name].check("failure_rate")
+    if state:
+        await publish_health_alert(backend_name, "failure_rate", state)
+
+def sample_backend_queues() -> List[tuple]:
+    service = get_service(USERS[0])
+    samples = []
+    for backend in service.backends():
+        try:
+            samples.append((backend.name, getattr(backend.status(), "pending_jobs", 0) or 0))
+        except Exception:
+            continue
+    return samples
+
+async def observe_backend_queues():
+    samples = await asyncio.to_thread(sample_backend_queues)
+    now = time.time()
+    for backend_name, pending_jobs in samples:
+        _backend_health[backend_name].record_pending(pending_jobs, now)
+        state = _backend_health[backend_name].check("queue_growth")
+        if state:
+            await publish_health_alert(backend_name, "queue_growth", state)
+
 # ---------------------------
 # Background notifier
 # ---------------------------
@@ -163,21 +345,22 @@ async def notify_poll_loop():
                             last = _last_seen_job_status.get(job_id)
                             if last != current_status:
                                 _last_seen_job_status[job_id] = current_status
-                                event = {
+                                backend_name = str(getattr(job.backend(), "name", "Unknown"))
+                                await publish_event({
                                     "type": "job_status_change",
                                     "user": user["name"],
                                     "job_id": job_id,
                                     "status": current_status,
-                                    "backend": str(getattr(job.backend(), "name", "Unknown")),
+                                    "backend": backend_name,
                                     "timestamp": datetime.now().isoformat()
-                                }
-                                for ws in list(_active_websockets):
-                                    try:
-                                        await ws.send_json(event)
-                                    except Exception:
-                                        pass
+                                })
+                                # First sightings (e.g. after a restart) only seed the status map;
+                                # feeding that history to the EWMA would replay it oldest-last
+                                if last is not None and last not in TERMINAL_STATUSES:
+                                    await observe_job_transition(backend_name, current_status)
                     except Exception:
                         continue
+                await observe_backend_queues()
             except Exception:
                 traceback.print_exc()
             await asyncio.sleep(NOTIFY_POLL_INTERVAL)
@@ -187,13 +370,30 @@ async def notify_poll_loop():
 
 @app.on_event("startup")
 async def startup_event():
+    load_event_log()
     asyncio.create_task(notify_poll_loop())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _event_persist_task is not None:
+        await _event_persist_task
+
 @app.websocket("/ws/notifications")
-async def websocket_notifications(ws: WebSocket):
+async def websocket_notifications(ws: WebSocket, since: Optional[int] = None):
     await ws.accept()
+    # Snapshot the backlog and subscribe in the same step so nothing falls in between;
+    # live events may interleave with the replay, clients order by seq
+    missed = events_since(since) if since is not None else []
     _active_websockets.append(ws)
     try:
+        if since is not None:
+            oldest = _event_log[0]["seq"] if _event_log else _event_seq + 1
+            # Older than the ring, or from before a restart without persistence
+            if since + 1 < oldest or since > _event_seq:
+                await ws.send_json({"type": "replay_gap", "since": since, "oldest_available": oldest,
+                                    "timestamp": datetime.now().isoformat()})
+            for event in missed:
+                await ws.send_json(event)
         while True:
             data = await ws.receive_text()
             if data.lower().strip() in ("ping", "hello"):
@@ -253,6 +453,20 @@ def backend_heatmap():
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Heatmap error: {str(e)}")
 
+@app.get("/notifications/events")
+async def get_notification_events(since: int = 0, limit: int = Query(default=500, le=5000)):
+    # Runs on the event loop, which is the only writer of _event_log
+    events = events_since(since)[:limit]
+    return {"latest_seq": _event_seq, "oldest_seq": _event_log[0]["seq"] if _event_log else None,
+            "total_events": len(events), "events": events}
+
+@app.get("/backends/health")
+async def get_backend_health():
+    # Runs on the event loop, like the poller that inserts into _backend_health
+    return {"thresholds": {"failure_rate": FAILURE_RATE_ALERT, "queue_growth_per_min": QUEUE_GROWTH_ALERT},
+            "backends": {name: health.snapshot() for name, health in _backend_health.items()},
+            "timestamp": datetime.now().isoformat()}
+
 @app.get("/users")
 def get_all_users():
     return {"total_users": len(USERS), "users": [u["name"] for u in USERS]}